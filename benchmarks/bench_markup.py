@@ -0,0 +1,84 @@
+"""Benchmark markup.generate_markup renders per second.
+
+Every render starts from empty section caches, so the figure stays comparable
+with renders before they were memoized; the all-hits rate is printed after it.
+
+Usage: python benchmarks/bench_markup.py [--seconds N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markup import clear_section_caches, generate_markup  # noqa: E402
+
+ICONS = ["clear", "partly_cloudy", "rain", "rain", "snow", "thunderstorm", "overcast"]
+
+
+def sample_weather_data():
+    """A representative parsed forecast (19 chart hours, 7 days)."""
+    chart_hours = [
+        {
+            "time": f"2025-01-15T{h % 24:02d}:00",
+            "precipitation": (h * 17) % 100,
+            "wind_speed": 5 + (h * 7) % 20,
+            "wind_direction": "SW",
+            "wind_arrow": "↙",
+        }
+        for h in range(6, 25)
+    ]
+    labels = ["6am", "9am", "12pm", "3pm", "6pm", "9pm", "12am"]
+    hourly = [dict(chart_hours[i * 3], time=label) for i, label in enumerate(labels)]
+    daily = [
+        {
+            "day": day,
+            "high": 60 + i,
+            "low": 40 + i,
+            "icon": ICONS[i],
+            "description": "",
+            "temp_symbol": "°F",
+        }
+        for i, day in enumerate(["Today", "Thu", "Fri", "Sat", "Sun", "Mon", "Tue"])
+    ]
+    current = {
+        "temp": 54, "feels_like": 51, "temp_symbol": "°F", "precipitation": 40,
+        "humidity": 77, "wind_speed": 12, "wind_unit": "mph", "weather_code": 61,
+        "description": "Light Rain", "icon": "rain",
+    }
+    return {"current": current, "hourly": hourly, "chart_hours": chart_hours, "daily": daily}
+
+
+def _rate(render, seconds):
+    """Return (renders, elapsed seconds) of calling render for about ``seconds``."""
+    render()  # warm up
+    renders = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            render()
+        renders += 100
+    return renders, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3.0, help="Time budget for each run")
+    args = parser.parse_args()
+
+    data = sample_weather_data()
+
+    def uncached():
+        clear_section_caches()
+        generate_markup(data)
+
+    for label, render in (("generate_markup", uncached), ("generate_markup (cached)", lambda: generate_markup(data))):
+        renders, elapsed = _rate(render, args.seconds)
+        print(f"{label}: {renders / elapsed:,.0f} renders/s ({elapsed / renders * 1e6:.1f} us/render)")
+
+
+if __name__ == "__main__":
+    main()
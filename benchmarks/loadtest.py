@@ -0,0 +1,312 @@
+"""Load test for the polling server: many simulated TRMNL devices polling WeatherHandler.
+
+Starts stub_server.py in-process as the upstream and server.py as a
+subprocess against it (or targets --url), then has --devices devices poll
+over at most --concurrency connections for --duration seconds. Reports
+throughput, status counts and p50/p95/p99 latency.
+
+Each device remembers its last ETag and, if it is one of the --conditional
+fraction, sends If-None-Match like a device whose screen is already current.
+With --interval 0 (the default) devices poll back to back, which measures the
+server's saturation throughput. With --interval N each device polls every N
+seconds, +/- --jitter as a fraction, starting at a random offset. That is an
+open-loop load, and latency includes any wait for a free connection.
+
+Usage:
+  python benchmarks/loadtest.py --devices 2000 --concurrency 200 --duration 20
+  python benchmarks/loadtest.py --devices 5000 --interval 5 --jitter 0.3 --conditional 0.9
+  python benchmarks/loadtest.py --workers 4 --json results-4.json    Compare serving modes
+  python benchmarks/loadtest.py --url http://localhost:5000/         An already running server
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_server import DEFAULT_FIXTURE_DIR, StubState, make_server  # noqa: E402
+
+
+class Device:
+    __slots__ = ("conditional", "etag")
+
+    def __init__(self, conditional):
+        self.conditional = conditional
+        self.etag = None
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = {}
+        self.bytes = 0
+
+    def add(self, latency, status, size):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes += size
+
+    def error(self, exc):
+        name = type(exc).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))]
+
+
+class Connection:
+    """One HTTP/1.1 connection on asyncio streams, reopened when the server closes it."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, path, headers):
+        """Send a GET; returns (status, headers dict, body length)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        try:
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionResetError("server closed the connection")
+            status = int(status_line.split()[1])
+            response_headers = {}
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+            length = int(response_headers.get("content-length", 0))
+            if length:
+                await self.reader.readexactly(length)
+        except BaseException:
+            self.close()
+            raise
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, response_headers, length
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def _poll(device, pool, path, base_headers, keep_alive, results, due):
+    conn = await pool.get()
+    try:
+        headers = dict(base_headers)
+        if device.conditional and device.etag:
+            headers["If-None-Match"] = device.etag
+        if not keep_alive:
+            headers["Connection"] = "close"
+        try:
+            status, response_headers, size = await conn.request(path, headers)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as exc:
+            results.error(exc)
+            return
+        results.add(time.perf_counter() - due, status, size)
+        device.etag = response_headers.get("etag", device.etag)
+        if not keep_alive:
+            conn.close()
+    finally:
+        pool.put_nowait(conn)
+
+
+async def run_load(url, devices, concurrency, duration, interval=0.0, jitter=0.0, conditional=1.0,
+                   keep_alive=True, accept_encoding="gzip"):
+    """Poll url from simulated devices for duration seconds; returns (Results, elapsed seconds)."""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    base_headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+    fleet = [Device(random.random() < conditional) for _ in range(devices)]
+    pool = asyncio.Queue()
+    for _ in range(concurrency):
+        pool.put_nowait(Connection(host, port))
+    results = Results()
+    start = time.perf_counter()
+    stop_at = start + duration
+
+    async def closed_loop(worker):
+        # Back to back: each connection serves devices round-robin
+        i = worker
+        while time.perf_counter() < stop_at:
+            await _poll(fleet[i % devices], pool, path, base_headers, keep_alive, results, time.perf_counter())
+            i += concurrency
+
+    async def open_loop(device):
+        due = start + random.uniform(0, interval)
+        while due < stop_at:
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await _poll(device, pool, path, base_headers, keep_alive, results, due)
+            due += interval * random.uniform(1 - jitter, 1 + jitter)
+
+    if interval > 0:
+        tasks = [open_loop(device) for device in fleet]
+    else:
+        tasks = [closed_loop(worker) for worker in range(min(concurrency, devices))]
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    while not pool.empty():
+        pool.get_nowait().close()
+    return results, elapsed
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(upstream_url, workers, cache_dir, path="/"):
+    """Start server.py on a free port against the stub; returns (process, url of path).
+
+    Ready means several polls in a row got real data, so with --workers every
+    worker is likely to be serving before the clock starts.
+    """
+    port = _free_port()
+    env = dict(
+        os.environ, PORT=str(port), WORKERS=str(workers),
+        OPEN_METEO_URL=upstream_url + "/v1/forecast", TRMNL_API_URL=upstream_url,
+        CACHE_DIR=os.path.join(cache_dir, "forecasts"), HISTORY_PATH=os.path.join(cache_dir, "history.bin"),
+        SHARED_CACHE_PATH=os.path.join(cache_dir, "shared"),
+    )
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py")], env=env, cwd=cache_dir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}{path}"
+    ready = 0
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server.py exited with status {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                ok = b"Weather data unavailable" not in resp.read()
+        except (OSError, urllib.error.URLError):
+            ok = False
+        ready = ready + 1 if ok else 0
+        if ready >= 5 * workers:
+            return proc, url
+        time.sleep(0 if ok else 0.1)
+    proc.kill()
+    raise SystemExit("server.py did not start serving data within 30s")
+
+
+def report(results, elapsed, cpu_seconds):
+    latencies = sorted(results.latencies)
+    summary = {
+        "requests": len(latencies),
+        "errors": results.errors,
+        "statuses": {str(k): v for k, v in sorted(results.statuses.items())},
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "mib_per_second": round(results.bytes / elapsed / 2 ** 20, 3),
+        "latency_ms": {
+            name: round(percentile(latencies, q) * 1000, 3)
+            for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "client_cpu": round(cpu_seconds / elapsed, 2),
+    }
+    latency = summary["latency_ms"]
+    print(f"requests:   {summary['requests']} in {elapsed:.1f}s "
+          f"({summary['requests_per_second']:,.0f}/s, {summary['mib_per_second']:.2f} MiB/s)")
+    print("statuses:   " + ", ".join(f"{k}: {v}" for k, v in summary["statuses"].items()))
+    if results.errors:
+        print("errors:     " + ", ".join(f"{k}: {v}" for k, v in results.errors.items()))
+    print(f"latency:    p50 {latency['p50']:.2f} ms  p95 {latency['p95']:.2f} ms  "
+          f"p99 {latency['p99']:.2f} ms  max {latency['max']:.2f} ms")
+    if summary["client_cpu"] > 0.9:
+        print(f"warning:    the load generator used {summary['client_cpu']:.0%} of a CPU; "
+              "throughput may be limited by this process, not the server")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Poll this server instead of starting server.py")
+    parser.add_argument("--path", default="/", help="Path to poll on the started server (e.g. /image.bmp)")
+    parser.add_argument("--workers", type=int, default=1, help="WORKERS for the started server.py")
+    parser.add_argument("--devices", type=int, default=1000, help="Simulated devices")
+    parser.add_argument("--concurrency", type=int, default=64, help="Connections (in-flight requests)")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to poll for")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Seconds between one device's polls (0 = back to back)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Poll interval jitter, as a fraction")
+    parser.add_argument("--conditional", type=float, default=0.9,
+                        help="Fraction of devices sending If-None-Match")
+    parser.add_argument("--no-keep-alive", action="store_true",
+                        help="Open a new connection per poll, like devices waking from sleep")
+    parser.add_argument("--accept-encoding", default="gzip", help="Accept-Encoding header ('' for none)")
+    parser.add_argument("--upstream-latency", type=float, default=150, help="Stub Open-Meteo latency, in ms")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    stub = proc = None
+    with tempfile.TemporaryDirectory(prefix="trmnl-loadtest-") as cache_dir:
+        try:
+            if args.url:
+                url = args.url
+            else:
+                state = StubState(DEFAULT_FIXTURE_DIR, latency=args.upstream_latency / 1000)
+                stub = make_server(state)
+                threading.Thread(target=stub.serve_forever, daemon=True).start()
+                proc, url = start_server(f"http://127.0.0.1:{stub.server_address[1]}", args.workers, cache_dir,
+                                         args.path)
+            print(f"Polling {url} from {args.devices} devices over {args.concurrency} connections "
+                  f"for {args.duration:g}s" + (f", every {args.interval:g}s" if args.interval else ""))
+
+            cpu_start = time.process_time()
+            results, elapsed = asyncio.run(run_load(
+                url, args.devices, args.concurrency, args.duration, args.interval, args.jitter,
+                args.conditional, not args.no_keep_alive, args.accept_encoding,
+            ))
+            summary = report(results, elapsed, time.process_time() - cpu_start)
+            summary["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+            if stub is not None:
+                summary["upstream"] = stub.RequestHandlerClass.state.stats()
+                print(f"upstream:   {summary['upstream']['forecast_requests']} forecast requests")
+        finally:
+            if proc is not None:
+                proc.send_signal(signal.SIGTERM)
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+            if stub is not None:
+                stub.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
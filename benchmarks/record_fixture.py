@@ -0,0 +1,36 @@
+"""Record a live Open-Meteo response as a benchmark fixture.
+
+Usage: python benchmarks/record_fixture.py NAME LATITUDE LONGITUDE
+Writes benchmarks/fixtures/NAME.json, in the metric units weather.py always
+requests. Fixtures are parsed as of 10:30 on their first forecast day, so no
+re-basing is needed when they age.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather import fetch_weather  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("name")
+    parser.add_argument("latitude", type=float)
+    parser.add_argument("longitude", type=float)
+    args = parser.parse_args()
+
+    raw = fetch_weather(args.latitude, args.longitude)
+    path = os.path.join(FIXTURE_DIR, f"{args.name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(raw, f, separators=(",", ":"))
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Benchmark suite for the fetch -> parse -> render -> post pipeline.
+
+Runs each hot path against the Open-Meteo fixtures in benchmarks/fixtures/
+(clear, stormy, and missing-data with a skipped hour; no network) and reports per-stage latency and peak
+allocations, plus end-to-end throughput across many locations.
+
+Usage:
+  python benchmarks/run.py                    Print results
+  python benchmarks/run.py --check            Also fail on regressions vs baseline.json
+  python benchmarks/run.py --update-baseline  Store the results as the new baseline
+  python benchmarks/run.py --check --baseline base.json
+                                              Compare against a baseline recorded elsewhere,
+                                              e.g. on the same machine from another commit
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import timeit
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import server  # noqa: E402
+from cache import StaleWhileRevalidateCache  # noqa: E402
+from markup import build_merge_variables, clear_section_caches, generate_markup  # noqa: E402
+from raster import dither, draw_frame, encode_png, frame_key  # noqa: E402
+from stub_server import rebase_forecast  # noqa: E402
+from weather import parse_weather_batch, parse_weather_data  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Each fixture is parsed as of 10:30 local time on its first forecast day
+FIXTURES = ["clear", "stormy", "missing"]
+
+# Latency is machine-dependent, so it gets a looser tolerance than allocations
+LATENCY_TOLERANCE = 1.5
+ALLOC_TOLERANCE = 1.2
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, f"{name}.json"), encoding="utf-8") as f:
+        raw = json.load(f)
+    now = datetime.fromisoformat(raw["daily"]["time"][0] + "T10:30")
+    return raw, now
+
+
+def measure(fn, repeat=5, min_time=0.2):
+    """Return (median seconds per call, peak bytes allocated by one call)."""
+    fn()  # warm up caches and lazy imports
+    number = 1
+    while timeit.timeit(fn, number=number) < min_time / repeat:
+        number *= 2
+    per_call = statistics.median(t / number for t in timeit.repeat(fn, number=number, repeat=repeat))
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call, peak
+
+
+def _serve_fixture(raw):
+    """Start the polling server in-process on a free port, backed by a fixture.
+
+    The server renders against the wall clock, so the fixture is shifted to today.
+    """
+    raw = rebase_forecast(raw, datetime.now().date())
+    server._raw_forecast = StaleWhileRevalidateCache(lambda: raw, ttl=3600)
+    httpd = server.PollingHTTPServer(("127.0.0.1", 0), server.WeatherHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def _get(conn, headers):
+    conn.request("GET", "/", headers=headers)
+    resp = conn.getresponse()
+    resp.read()
+    return resp
+
+
+def uncached(fn):
+    """Wrap fn to empty the markup section caches first, so every call renders from scratch."""
+    def run():
+        clear_section_caches()
+        return fn()
+    return run
+
+
+def stage_benchmarks():
+    """Latency and peak allocation per pipeline stage, per fixture."""
+    results = {}
+    for name in FIXTURES:
+        raw, now = load_fixture(name)
+        data = parse_weather_data(raw, now=now)
+        key = frame_key(data)
+        stages = {
+            "parse": lambda: parse_weather_data(raw, now=now),
+            "render": uncached(lambda: generate_markup(data)),
+            "render_sprites": uncached(lambda: generate_markup(data, sprites=True)),
+            # Same data again: every section is a hit in the section caches
+            "render_cached": lambda: generate_markup(data),
+            "merge_variables": uncached(lambda: build_merge_variables(data)),
+            # Uncached: draw, dither and encode a 1-bit PNG
+            "raster": lambda: encode_png(dither(draw_frame(key).pixels)),
+        }
+        for stage, fn in stages.items():
+            results[f"{stage}[{name}]"] = measure(fn)
+
+    # do_GET over a keep-alive connection: a full gzip response and a 304
+    server.log.disabled = True
+    httpd = _serve_fixture(load_fixture("stormy")[0])
+    try:
+        conn = http.client.HTTPConnection(*httpd.server_address)
+        etag = _get(conn, {}).getheader("ETag")
+        results["do_GET[200 gzip]"] = measure(lambda: _get(conn, {"Accept-Encoding": "gzip"}))
+        results["do_GET[304]"] = measure(lambda: _get(conn, {"If-None-Match": etag}))
+        conn.close()
+    finally:
+        httpd.shutdown()
+        server.log.disabled = False
+    return results
+
+
+def throughput_benchmark(locations):
+    """End-to-end parse + render + merge variables for many locations, in locations/s."""
+    # Every location uses the stormy fixture so the whole fleet shares one "now";
+    # the section caches are emptied per location, as if each had its own forecast
+    raw, now = load_fixture("stormy")
+    raws = [raw] * locations
+
+    start = time.perf_counter()
+    for data in parse_weather_batch(raws, now=now):
+        clear_section_caches()
+        generate_markup(data)
+        build_merge_variables(data)
+    elapsed = time.perf_counter() - start
+    return locations / elapsed
+
+
+def compare(results, baseline, tolerance=LATENCY_TOLERANCE):
+    """Return a list of regression messages versus the baseline."""
+    failures = []
+    for key, (latency, peak) in results.items():
+        if key not in baseline:
+            continue
+        base_latency, base_peak = baseline[key]
+        if latency > base_latency * tolerance:
+            failures.append(f"{key}: {latency * 1e6:.1f} us vs baseline {base_latency * 1e6:.1f} us")
+        if peak > base_peak * ALLOC_TOLERANCE:
+            failures.append(f"{key}: peak {peak} B vs baseline {base_peak} B")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, default=1000, help="Locations for the throughput run")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regressions vs baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Write results to baseline.json")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to check against or update")
+    parser.add_argument("--tolerance", type=float, default=LATENCY_TOLERANCE,
+                        help="Allowed latency/throughput slowdown factor for --check")
+    args = parser.parse_args()
+
+    results = stage_benchmarks()
+    print(f"{'stage':32} {'latency':>12} {'peak alloc':>12}")
+    for key, (latency, peak) in results.items():
+        print(f"{key:32} {latency * 1e6:>9.1f} us {peak / 1024:>9.1f} KiB")
+
+    rate = throughput_benchmark(args.locations)
+    print(f"\nend-to-end: {rate:,.0f} locations/s ({args.locations} locations)")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "stages": results,
+                "locations_per_second": round(rate),
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if args.check:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = compare(results, baseline["stages"], args.tolerance)
+        if rate * args.tolerance < baseline["locations_per_second"]:
+            failures.append(f"end-to-end: {rate:,.0f} vs baseline {baseline['locations_per_second']:,} locations/s")
+        if failures:
+            print("\nRegressions:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
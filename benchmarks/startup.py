@@ -0,0 +1,94 @@
+"""Cold-start report for ``server.py --once``: what importing server.py costs.
+
+Imports server.py in fresh interpreters under ``python -X importtime`` and
+prints the median total next to a bare interpreter start, plus the slowest
+modules imported along the way. Modules that --once never needs (raster, the
+process pool, requests, NumPy) must stay off this path; --check fails if one
+is imported or the median import exceeds the budget.
+
+Usage:
+  python benchmarks/startup.py                  Print the report
+  python benchmarks/startup.py --check          Also fail if over budget
+  python benchmarks/startup.py --budget-ms 60   Use a different budget
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median wall time of `import server` on top of interpreter startup, in ms
+STARTUP_BUDGET_MS = 80
+
+# Loaded on first use, never at import
+DEFERRED = ("raster", "concurrent.futures.process", "requests", "numpy")
+
+
+def _run(code, importtime=False):
+    """Run code in a fresh interpreter; return (wall seconds, -X importtime lines)."""
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, proc.stderr.splitlines()
+
+
+def _parse_importtime(lines):
+    """Return [(module, self us, cumulative us, depth)] from -X importtime output."""
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        stripped = name.lstrip()
+        modules.append((stripped, int(self_us), int(cumulative_us), (len(name) - len(stripped) - 1) // 2))
+    return modules
+
+
+def measure(runs=7):
+    """Median ms for a bare interpreter and for `import server`, and the import breakdown."""
+    bare = statistics.median(_run("pass")[0] for _ in range(runs)) * 1000
+    total = statistics.median(_run("import server")[0] for _ in range(runs)) * 1000
+    _, lines = _run("import server", importtime=True)
+    return bare, total - bare, _parse_importtime(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when over budget")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="Allowed median `import server` time in ms")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    args = parser.parse_args()
+
+    bare, server_ms, modules = measure()
+    print(f"interpreter start: {bare:7.1f} ms")
+    print(f"import server:     {server_ms:7.1f} ms (budget {args.budget_ms:.0f} ms)\n")
+
+    # Everything server.py pulls in shows up nested under its own entry
+    end = next((i for i, m in enumerate(modules) if m[0] == "server" and m[3] == 0), len(modules))
+    start = max((i + 1 for i, m in enumerate(modules[:end]) if m[3] == 0), default=0)
+    children = [m for m in modules[start:end] if m[3] == 1]
+    print(f"{'module':32} {'self':>9} {'cumulative':>11}")
+    for name, self_us, cumulative_us, _ in sorted(children, key=lambda m: -m[2])[:args.top]:
+        print(f"{name:32} {self_us / 1000:>6.1f} ms {cumulative_us / 1000:>8.1f} ms")
+
+    failures = []
+    imported = {m[0] for m in modules[start:end]}
+    for name in DEFERRED:
+        if name in imported:
+            failures.append(f"{name} is imported at startup; import it where it is used")
+    if server_ms > args.budget_ms:
+        failures.append(f"import server: {server_ms:.1f} ms vs budget {args.budget_ms:.0f} ms")
+    if args.check:
+        if failures:
+            print("\nOver budget:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print("\nWithin budget.")
+
+
+if __name__ == "__main__":
+    main()
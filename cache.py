@@ -0,0 +1,324 @@
+"""Caching helpers for the TRMNL weather server."""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no LeaderLock, so no pre-fork serving
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# Read once: os.umask can only be read by setting it, which races other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class StaleWhileRevalidateCache:
+    """Single-value cache that serves the last good value while refreshing.
+
+    - The first ``get()`` loads synchronously; concurrent callers wait for that
+      same load instead of starting their own. If it fails, ``get()`` returns
+      ``fallback`` without loading until ``retry_interval`` seconds have passed.
+    - Once the value is older than ``ttl * (1 - refresh_ahead)`` a single
+      background thread reloads it while callers keep getting the old value.
+    - A failed refresh keeps the stale value and is retried no sooner than
+      ``retry_interval`` seconds later.
+
+    ``ttl`` is in seconds, or a callable ``ttl(value, loaded_at)`` that picks
+    the lifetime of each newly loaded value. With ``timestamped=True`` the
+    loader returns ``(value, loaded_at)`` instead of the value, for values
+    that are already some age when loaded (e.g. read from a DiskCache); their
+    lifetime counts from that time rather than from the load. ``on_access``,
+    if given, is called with "hit", "miss" or "stale" on every ``get()``.
+    """
+
+    def __init__(self, loader, ttl, refresh_ahead=0.1, retry_interval=60, fallback=None,
+                 on_access=None, timestamped=False):
+        self._loader = loader
+        self.timestamped = timestamped
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.retry_interval = retry_interval
+        self.fallback = fallback
+        self.on_access = on_access
+        self._value = None
+        self._loaded_at = 0.0
+        self._value_ttl = 0.0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._cold_load = threading.Lock()
+
+    def get(self, record=True):
+        """Return the cached value, loading or scheduling a refresh as needed.
+
+        ``record=False`` skips ``on_access``, for callers that are not requests.
+        """
+        if self._value is None:
+            self._record("miss", record)
+            return self._load_cold()
+
+        now = time.time()
+        if now - self._loaded_at >= self._value_ttl * (1 - self.refresh_ahead):
+            self._record("stale", record)
+            self._start_refresh(now)
+        else:
+            self._record("hit", record)
+        return self._value
+
+    def _record(self, result, record=True):
+        if record and self.on_access is not None:
+            self.on_access(result)
+
+    def _load_cold(self):
+        if time.time() < self._retry_at:
+            return self.fallback
+        with self._cold_load:
+            # Another caller may have finished the load while we waited, or
+            # seen it fail, in which case waiters must not retry it one by one
+            if self._value is not None:
+                return self._value
+            if time.time() < self._retry_at:
+                return self.fallback
+            try:
+                self._store(self._loader())
+            except Exception:
+                log.exception("Cache load failed")
+                self._retry_at = time.time() + self.retry_interval
+                return self.fallback
+            return self._value
+
+    def _start_refresh(self, now):
+        with self._lock:
+            if self._refreshing or now < self._retry_at:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="cache-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self._store(self._loader())
+        except Exception:
+            log.exception("Background refresh failed; serving stale value")
+            self._retry_at = time.time() + self.retry_interval
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _store(self, result):
+        value, loaded_at = result if self.timestamped else (result, time.time())
+        self._value_ttl = self.ttl(value, loaded_at) if callable(self.ttl) else self.ttl
+        self._value = value
+        self._loaded_at = loaded_at
+
+
+def atomic_write(path, data):
+    """Write bytes to path via a temp file + rename so readers never see partial data.
+
+    The file keeps the mode of the one it replaces; a new file gets the usual
+    umask-based mode rather than mkstemp's 0600.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.chmod(tmp_path, mode)
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_if_changed(path, data):
+    """atomic_write path unless it already holds exactly these bytes; True if written.
+
+    Unchanged outputs keep their mtime, so git and rsync see no churn.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    atomic_write(path, data)
+    return True
+
+
+class DiskCache:
+    """JSON-on-disk cache with a TTL and a total size cap.
+
+    Each entry is one file named after a hash of its key; its mtime is the
+    write time. ``ttl`` is in seconds, or a callable ``ttl(value, stored_at)``
+    giving each entry its own lifetime. When the directory grows past ``max_bytes`` the oldest entries
+    are evicted first. The directory size is scanned once and then tracked
+    across ``set()`` calls; it is rescanned only to evict.
+    """
+
+    def __init__(self, directory, ttl, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._total = None  # bytes in the directory, as of the last scan plus our own writes
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        return self.get_entry(key)[0]
+
+    def get_entry(self, key):
+        """Return (value, stored_at epoch seconds) for key, or (None, None) if missing or expired."""
+        path = self._path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if not callable(self.ttl) and time.time() - stored_at > self.ttl:
+                return None, None
+            with open(path, "rb") as f:
+                value = json.loads(f.read())
+        except (OSError, ValueError):
+            return None, None
+        if callable(self.ttl) and time.time() - stored_at > self.ttl(value, stored_at):
+            return None, None
+        return value, stored_at
+
+    def set(self, key, value):
+        """Store value under key, then evict old entries if over the size cap."""
+        path = self._path(key)
+        data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan()[1]
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            atomic_write(path, data)
+            self._total += len(data) - replaced
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        """Return ([(mtime, size, path)] of the entries, their total size)."""
+        entries = []
+        total = 0
+        if not os.path.isdir(self.directory):
+            return entries, total
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+        return entries, total
+
+    def _evict(self):
+        entries, total = self._scan()
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+        self._total = total
+
+
+class SharedSlot:
+    """One byte string shared between processes through a memory-mapped file.
+
+    A single writer publishes with a seqlock: the generation counter is odd
+    while a write is in progress, so readers retry instead of copying a torn
+    value. Readers can cheaply poll ``generation()`` to see whether anything
+    changed since their last ``read()``.
+    """
+
+    _HEADER = struct.Struct("<QI")  # generation, payload length
+
+    def __init__(self, path, size=8 * 1024 * 1024, create=False):
+        self.path = path
+        flags = os.O_RDWR | (os.O_CREAT | os.O_TRUNC if create else 0)
+        fd = os.open(path, flags, 0o600)
+        try:
+            if create:
+                os.ftruncate(fd, size)
+            self.size = os.fstat(fd).st_size
+            self._map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+    def generation(self):
+        return self._HEADER.unpack_from(self._map, 0)[0]
+
+    def publish(self, data):
+        """Store data as the new value (single writer only)."""
+        if self._HEADER.size + len(data) > self.size:
+            raise ValueError(f"{len(data)} bytes do not fit in shared slot {self.path} ({self.size} bytes)")
+        # A writer that died mid-publish leaves the generation odd; start from
+        # the even value below it so this write is odd while in progress too
+        generation = self.generation() & ~1
+        self._HEADER.pack_into(self._map, 0, generation + 1, 0)
+        self._map[self._HEADER.size:self._HEADER.size + len(data)] = data
+        self._HEADER.pack_into(self._map, 0, generation + 2, len(data))
+
+    def read(self, timeout=0.1):
+        """Return (generation, value); value is None until something is published.
+
+        Waits up to ``timeout`` seconds for a write in progress, which may never
+        finish if its writer died; then the value is None as well.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            generation, length = self._HEADER.unpack_from(self._map, 0)
+            if generation % 2:
+                if time.monotonic() >= deadline:
+                    return generation, None
+                time.sleep(0.0005)
+                continue
+            data = self._map[self._HEADER.size:self._HEADER.size + length]
+            if self.generation() == generation:
+                return generation, (data if generation else None)
+
+
+class LeaderLock:
+    """Leader election between processes: whoever holds an exclusive flock leads.
+
+    The OS drops the lock when its holder exits, so another process's next
+    ``try_acquire()`` takes over.
+    """
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.held = False
+
+    def try_acquire(self):
+        """Take the lock if it is free; returns whether this process leads."""
+        if not self.held:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            self.held = True
+        return True
@@ -11,12 +11,71 @@ TRMNL_PLUGIN_UUID = os.environ.get("TRMNL_PLUGIN_UUID", "") or "c0d6d16f-2184-4c
 # TRMNL API Key (from your TRMNL account)
 TRMNL_API_KEY = os.environ.get("TRMNL_API_KEY", "") or "user_0f33hpqsdxfx0v8akvc7ilrg"
 
-# Units: "fahrenheit" or "celsius" for temperature, "mph" or "kmh" for wind
+# Snap coordinates to a grid of this many degrees before the forecast cache and
+# Open-Meteo request, so nearby devices share one forecast (0 = exact coordinates;
+# 0.01 is about 1 km, roughly the finest Open-Meteo model grid)
+GRID_RESOLUTION_DEG = float(os.environ.get("GRID_RESOLUTION_DEG", "") or "0")
+
+# Upstream endpoints; point these at stub_server.py to run without network access
+OPEN_METEO_URL = os.environ.get("OPEN_METEO_URL", "") or "https://api.open-meteo.com/v1/forecast"
+TRMNL_API_URL = os.environ.get("TRMNL_API_URL", "") or "https://usetrmnl.com"
+
+# HTTP client for Open-Meteo and webhook calls: "requests", "stdlib" (http.client
+# with keep-alive; no dependencies and a faster --once start) or "auto" (requests
+# when installed)
+HTTP_CLIENT = os.environ.get("HTTP_CLIENT", "") or "auto"
+
+# Display units: "fahrenheit" or "celsius" for temperature; "mph", "kmh", "ms" or
+# "kn" for wind. Forecasts are always fetched in metric and converted locally,
+# so changing units never refetches.
 TEMPERATURE_UNIT = os.environ.get("TEMPERATURE_UNIT", "") or "fahrenheit"
 WIND_SPEED_UNIT = os.environ.get("WIND_SPEED_UNIT", "") or "mph"
 
-# Update interval in hours (also controls weather cache TTL)
-UPDATE_INTERVAL_HOURS = 3
+# Emit each weather icon once as an SVG <symbol> referenced by <use> (smaller markup)
+SVG_SPRITES = (os.environ.get("SVG_SPRITES", "") or "false").lower() in ("1", "true", "yes")
+
+# How long a fetched forecast is reused before refetching. Each forecast gets
+# its own interval between these bounds: near the minimum when the next hours
+# are volatile (precipitation swings, changing conditions, fast temperature
+# moves, thunderstorms), near the maximum when they are calm. Rendering follows
+# the clock hourly from the cached forecast; keep the maximum under 24 so the
+# 8-day forecast still covers the 7-day row.
+FORECAST_MIN_AGE_HOURS = float(os.environ.get("FORECAST_MIN_AGE_HOURS", "") or "1")
+FORECAST_MAX_AGE_HOURS = float(os.environ.get("FORECAST_MAX_AGE_HOURS", "") or "6")
+
+# On-disk forecast cache, reused across restarts and --once runs
+CACHE_DIR = os.environ.get("CACHE_DIR", "") or ".cache/forecasts"
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_MB", "") or "50") * 1024 * 1024
+
+# Hourly history of parsed forecasts (current conditions per location), kept in a
+# fixed-size memory-mapped file: HISTORY_HOURS per location for up to
+# HISTORY_MAX_LOCATIONS locations, 12 bytes per location-hour
+HISTORY_PATH = os.environ.get("HISTORY_PATH", "") or ".cache/history.bin"
+HISTORY_HOURS = int(os.environ.get("HISTORY_HOURS", "") or str(7 * 24))
+HISTORY_MAX_LOCATIONS = int(os.environ.get("HISTORY_MAX_LOCATIONS", "") or "64")
+
+# Hash of the last merge_variables POSTed per plugin, so unchanged payloads are skipped
+WEBHOOK_STATE_PATH = os.environ.get("WEBHOOK_STATE_PATH", "") or ".cache/webhook_state.json"
+
+# Webhook delivery: concurrent POSTs, requests/second per host, attempts per
+# payload, overall time budget, and where undeliverable payloads are logged
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "") or "8")
+WEBHOOK_RATE_PER_HOST = float(os.environ.get("WEBHOOK_RATE_PER_HOST", "") or "2")
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "") or "5")
+WEBHOOK_DEADLINE_SECONDS = float(os.environ.get("WEBHOOK_DEADLINE_SECONDS", "") or "300")
+WEBHOOK_DEAD_LETTER_PATH = os.environ.get("WEBHOOK_DEAD_LETTER_PATH", "") or ".cache/webhook_dead_letter.jsonl"
+
+# Optional JSON list of locations for --once, one page per location (see README);
+# empty renders the single location above to docs/index.html
+LOCATIONS_FILE = os.environ.get("LOCATIONS_FILE", "")
+
+# Processes rendering locations in parallel for --once with a locations file (0 = one per CPU)
+ONCE_WORKERS = int(os.environ.get("ONCE_WORKERS", "") or "0")
 
 # Port for the polling HTTP server
 PORT = int(os.environ.get("PORT", 5000))
+
+# Worker processes for the polling server (>1 pre-forks; POSIX only). Workers
+# share one render through a memory-mapped file, by default in /dev/shm.
+WORKERS = int(os.environ.get("WORKERS", "") or "1")
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH", "")
@@ -0,0 +1,178 @@
+"""Webhook delivery to TRMNL: bounded worker pool, per-host rate limiting,
+exponential backoff that honors Retry-After, and a dead-letter log."""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import http_client
+
+log = logging.getLogger(__name__)
+
+TRMNL_WEBHOOK_URL = "https://usetrmnl.com/api/custom_plugins/{plugin_uuid}"
+
+DeliveryResult = namedtuple("DeliveryResult", "plugin_uuid ok status attempts error")
+
+
+class HostRateLimiter:
+    """Spaces requests to each host at least 1/rate seconds apart, across threads."""
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        """Block until a request to host may be sent."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def defer(self, host, seconds):
+        """Hold back every request to host for at least seconds (e.g. after a 429)."""
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._next_slot[host] = max(self._next_slot.get(host, until), until)
+
+
+def _retry_after_seconds(value):
+    """Parse a Retry-After header (delta-seconds or HTTP-date); None if absent or invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class WebhookDelivery:
+    """POSTs merge variables to many TRMNL plugins within a bounded wall time.
+
+    Connection errors, timeouts, 429 and 5xx responses are retried with
+    exponential backoff (full jitter), waiting at least as long as any
+    Retry-After header says; a 429 also holds back the rest of the pool's
+    requests to that host. Other 4xx responses are not retried. Deliveries
+    that fail for good, or would run past ``deadline`` seconds, are appended
+    to the JSON-lines ``dead_letter_path``.
+    """
+
+    def __init__(self, api_key, url_template=TRMNL_WEBHOOK_URL, workers=8, rate_per_host=2.0,
+                 max_attempts=5, backoff_base=1.0, backoff_max=60.0, timeout=30.0,
+                 deadline=300.0, dead_letter_path=None):
+        self.api_key = api_key
+        self.url_template = url_template
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.deadline = deadline
+        self.dead_letter_path = dead_letter_path
+        self.limiter = HostRateLimiter(rate_per_host)
+        self._local = threading.local()
+        self._dead_letter_lock = threading.Lock()
+
+    def deliver_all(self, payloads):
+        """POST each {plugin_uuid: merge_variables} item; returns DeliveryResults in order."""
+        if not payloads:
+            return []
+        give_up_at = time.monotonic() + self.deadline
+        items = list(payloads.items())
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as pool:
+            return list(pool.map(lambda item: self._deliver(*item, give_up_at), items))
+
+    def deliver(self, plugin_uuid, merge_variables):
+        """POST one payload with retries; returns a DeliveryResult."""
+        return self._deliver(plugin_uuid, merge_variables, time.monotonic() + self.deadline)
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = http_client.backend().Session()
+        return session
+
+    def _deliver(self, plugin_uuid, merge_variables, give_up_at):
+        url = self.url_template.format(plugin_uuid=plugin_uuid)
+        host = urlsplit(url).netloc
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        payload = {"merge_variables": merge_variables}
+        status = None
+        error = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            self.limiter.acquire(host)
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                error = error or "deadline exceeded"
+                break
+
+            retry_after = None
+            try:
+                resp = self._session().post(
+                    url, json=payload, headers=headers, timeout=min(self.timeout, remaining),
+                )
+            except http_client.backend().RequestException as exc:
+                status, error = None, f"{type(exc).__name__}: {exc}"
+            else:
+                status = resp.status_code
+                if resp.ok:
+                    log.info("TRMNL %s: %s (attempt %d)", plugin_uuid, status, attempt)
+                    return DeliveryResult(plugin_uuid, True, status, attempt, None)
+                error = resp.text[:200]
+                if status != 429 and status < 500:
+                    log.error("TRMNL %s: %s %s (not retrying)", plugin_uuid, status, error)
+                    self._dead_letter(plugin_uuid, merge_variables, status, attempt, error)
+                    return DeliveryResult(plugin_uuid, False, status, attempt, error)
+                retry_after = _retry_after_seconds(resp.headers.get("Retry-After"))
+                if status == 429 and retry_after is not None:
+                    self.limiter.defer(host, retry_after)
+
+            if attempt == self.max_attempts:
+                break
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if time.monotonic() + delay >= give_up_at:
+                error = f"{error}; next retry would pass the deadline"
+                break
+            log.warning("TRMNL %s: %s, retrying in %.1fs (attempt %d/%d)",
+                        plugin_uuid, status or error, delay, attempt, self.max_attempts)
+            time.sleep(delay)
+
+        log.error("TRMNL %s: giving up after %d attempts: %s", plugin_uuid, attempt, error)
+        self._dead_letter(plugin_uuid, merge_variables, status, attempt, error)
+        return DeliveryResult(plugin_uuid, False, status, attempt, error)
+
+    def _dead_letter(self, plugin_uuid, merge_variables, status, attempts, error):
+        if not self.dead_letter_path:
+            return
+        record = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "plugin_uuid": plugin_uuid,
+            "status": status,
+            "attempts": attempts,
+            "error": error,
+            "merge_variables": merge_variables,
+        }
+        with self._dead_letter_lock:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
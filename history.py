@@ -0,0 +1,184 @@
+"""Bounded hourly history of parsed forecasts, per location, in ring buffers.
+
+Each time a forecast is parsed, its current-hour values (see FIELDS) are
+recorded for the location. Every location slot holds the last ``hours``
+hours of each field as int16 values, so a store never grows past its
+creation size. The file can be memory-mapped, and a query reads one or two
+slices of the mapping.
+
+File layout (little-endian):
+  header  magic, version, field count, hours, location slots, temperature
+          symbol and wind unit of the stored values
+  table   per slot: latitude, longitude (float64), the newest recorded
+          hour (int64 hours since the epoch; 0 = free slot) and the time of
+          the last record (float64 epoch seconds, for eviction)
+  series  per slot, per field: ``hours`` int16 values; hour h is at h % hours
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+FIELDS = ("temp", "feels_like", "precipitation", "humidity", "wind_speed", "weather_code")
+
+# Stored for hours with no sample (never recorded, or skipped between fetches)
+MISSING = -32768
+
+_MAGIC = b"TWHS"
+_VERSION = 2
+_HEADER = struct.Struct("<4sHHII8s8s")  # magic, version, fields, hours, slots, temp symbol, wind unit
+_SLOT = struct.Struct("<ddqd")  # latitude, longitude, newest hour, last recorded at
+
+
+def _hour(when):
+    """Hours since the epoch for a naive local (or aware) datetime."""
+    return int(when.timestamp() // 3600)
+
+
+def _key(location):
+    latitude, longitude = location
+    return round(latitude, 4), round(longitude, 4)
+
+
+class HistoryStore:
+    """Per-location hourly series of parsed forecast values with a fixed memory cap.
+
+    With a ``path`` the store is a memory-mapped file that survives restarts
+    and can be shared between processes (one writer). A file with a different
+    layout is replaced. Without a path it lives in anonymous memory. When all
+    ``max_locations`` slots are in use, the least recently updated location
+    is evicted.
+    """
+
+    def __init__(self, path=None, hours=7 * 24, max_locations=64):
+        self.path = path
+        self.hours = hours
+        self.max_locations = max_locations
+        self._series_offset = _HEADER.size + _SLOT.size * max_locations
+        self.size = self._series_offset + 2 * len(FIELDS) * hours * max_locations
+        self._lock = threading.Lock()
+
+        if path is None:
+            self._map = mmap.mmap(-1, self.size)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                existing = os.fstat(fd).st_size
+                if existing != self.size:
+                    if existing:
+                        log.warning("History file %s has a different layout, starting over", path)
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self.size)
+                self._map = mmap.mmap(fd, self.size)
+            finally:
+                os.close(fd)
+        magic, version, fields, stored_hours, slots, _, _ = _HEADER.unpack_from(self._map, 0)
+        if (magic, version, fields, stored_hours, slots) != (_MAGIC, _VERSION, len(FIELDS), hours, max_locations):
+            if any(magic):
+                log.warning("History file %s has a different layout, starting over", path)
+            self._reset(b"", b"")
+        self._series = memoryview(self._map)[self._series_offset:].cast("h")
+
+    def _reset(self, temp_symbol, wind_unit):
+        self._map[:self._series_offset] = bytes(self._series_offset)
+        _HEADER.pack_into(self._map, 0, _MAGIC, _VERSION, len(FIELDS), self.hours, self.max_locations,
+                          temp_symbol, wind_unit)
+
+    def _slots(self):
+        """[(latitude, longitude, newest hour, last recorded at)] for every slot, read from the mapping."""
+        return list(_SLOT.iter_unpack(self._map[_HEADER.size:self._series_offset]))
+
+    def _find(self, key):
+        for index, (latitude, longitude, newest, _) in enumerate(self._slots()):
+            if newest and (latitude, longitude) == key:
+                return index, newest
+        return None, 0
+
+    def _allocate(self, key):
+        slots = self._slots()
+        # Least recently recorded first; the record time orders locations
+        # recorded within the same hour, which would otherwise tie
+        index = min(range(len(slots)), key=lambda i: (slots[i][2], slots[i][3]))
+        if slots[index][2]:
+            log.debug("History full, evicting (%.4f, %.4f)", slots[index][0], slots[index][1])
+        return index
+
+    def record(self, location, data, now=None):
+        """Store the current values of parse_weather_data output for a (lat, lon) location.
+
+        Recording the same hour again overwrites it; hours between the previous
+        sample and this one become missing. Returns False if ``now`` is older
+        than the window kept for the location.
+        """
+        current = data["current"]
+        units = (current["temp_symbol"].encode("utf-8"), current["wind_unit"].encode("utf-8"))
+        hour = _hour(now or datetime.now())
+        key = _key(location)
+        width = self.hours
+        with self._lock:
+            stored_units = tuple(v.rstrip(b"\0") for v in _HEADER.unpack_from(self._map, 0)[5:])
+            if stored_units != units:
+                if any(stored_units):
+                    log.warning("Display units changed from %s to %s, clearing history",
+                                "/".join(u.decode() for u in stored_units), "/".join(u.decode() for u in units))
+                self._reset(*units)
+
+            index, newest = self._find(key)
+            if index is None:
+                index = self._allocate(key)
+            elif hour <= newest - width:
+                return False
+            base = index * len(FIELDS) * width
+            if hour > newest:
+                # Skipped hours (all of them, for a new slot) must not show older values
+                for h in range(max(newest + 1, hour - width + 1), hour):
+                    for f in range(len(FIELDS)):
+                        self._series[base + f * width + h % width] = MISSING
+            _SLOT.pack_into(self._map, _HEADER.size + index * _SLOT.size, key[0], key[1], max(hour, newest),
+                            time.time())
+            for f, name in enumerate(FIELDS):
+                value = current.get(name)
+                self._series[base + f * width + hour % width] = (
+                    MISSING if value is None else max(-32767, min(32767, round(value)))
+                )
+        return True
+
+    def series(self, location, field, hours=48, now=None):
+        """The last ``hours`` hourly values of a field, oldest first, ending at ``now``'s hour.
+
+        Hours without a sample are None.
+        """
+        f = FIELDS.index(field)
+        end = _hour(now or datetime.now())
+        start = end - hours + 1
+        width = self.hours
+        with self._lock:
+            index, newest = self._find(_key(location))
+            if index is None:
+                return [None] * hours
+            lo, hi = max(start, newest - width + 1), min(end, newest)
+            if lo > hi:
+                return [None] * hours
+            row = self._series[(index * len(FIELDS) + f) * width:][:width]
+            i, j = lo % width, hi % width
+            values = row[i:j + 1].tolist() if i <= j else row[i:].tolist() + row[:j + 1].tolist()
+        values = [None if v == MISSING else v for v in values]
+        return [None] * (lo - start) + values + [None] * (end - hi)
+
+    def units(self):
+        """(temperature symbol, wind unit) of the stored values; empty before the first record."""
+        return tuple(v.rstrip(b"\0").decode("utf-8") for v in _HEADER.unpack_from(self._map, 0)[5:])
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        self._series.release()
+        self._map.close()
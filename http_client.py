@@ -0,0 +1,159 @@
+"""Keep-alive HTTP client on http.client: a stdlib stand-in for the parts of
+requests that weather.py and delivery.py use.
+
+Importing requests (urllib3, certifi, ...) costs more than the rest of a
+``server.py --once`` run's imports together. ``backend()`` returns the client
+chosen with ``use()``: "requests", "stdlib" (this module), or "auto"
+(requests when installed). Both expose get(), Session(), RequestException and
+responses with status_code, ok, headers, text, json() and raise_for_status().
+"""
+
+import http.client
+import json as jsonlib
+import sys
+import zlib
+from urllib.parse import urlsplit
+
+BACKENDS = ("auto", "requests", "stdlib")
+
+USER_AGENT = "trmnl-weather"
+
+_choice = "auto"
+_backend = None
+
+
+class RequestException(IOError):
+    """A request failed: connection error, timeout or (from raise_for_status) an error status."""
+
+    def __init__(self, *args, response=None):
+        super().__init__(*args)
+        self.response = response
+
+
+class HTTPError(RequestException):
+    pass
+
+
+class Response:
+    def __init__(self, url, status_code, reason, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers  # http.client.HTTPMessage: case-insensitive get()
+        self.content = content
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.headers.get_content_charset() or "utf-8", "replace")
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPError(f"{self.status_code} {self.reason} for url: {self.url}", response=self)
+
+
+class Session:
+    """Reuses one connection per scheme and host, like requests.Session. Not thread-safe."""
+
+    def __init__(self):
+        self._connections = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for conn in self._connections.values():
+            conn.close()
+        self._connections.clear()
+
+    def get(self, url, headers=None, timeout=None):
+        return self.request("GET", url, headers=headers, timeout=timeout)
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        body = None
+        headers = dict(headers or {})
+        if json is not None:
+            body = jsonlib.dumps(json).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        return self.request("POST", url, body=body, headers=headers, timeout=timeout)
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise RequestException(f"Unsupported URL scheme: {url}")
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip", **(headers or {})}
+        key = (parts.scheme, parts.netloc)
+
+        # A reused connection may have been closed by the server while idle;
+        # that shows up as a disconnect on first use and is retried once on a
+        # fresh connection
+        for retry_stale in (True, False):
+            conn = self._connections.get(key)
+            reused = conn is not None
+            if conn is None:
+                cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+                conn = self._connections[key] = cls(parts.netloc, timeout=timeout)
+            else:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+            try:
+                conn.request(method, target, body, headers)
+                resp = conn.getresponse()
+                content = resp.read()
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                del self._connections[key]
+                stale = isinstance(exc, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if reused and stale and retry_stale:
+                    continue
+                raise RequestException(f"{method} {url}: {type(exc).__name__}: {exc}") from exc
+            break
+
+        if resp.will_close:
+            conn.close()
+            del self._connections[key]
+        if resp.getheader("Content-Encoding", "").lower() == "gzip":
+            content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+        return Response(url, resp.status, resp.reason, resp.headers, content)
+
+
+def get(url, headers=None, timeout=None):
+    """One GET on a throwaway connection."""
+    with Session() as session:
+        return session.get(url, headers=headers, timeout=timeout)
+
+
+def use(name):
+    """Select the client that backend() returns: "auto", "requests" or "stdlib"."""
+    global _choice, _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HTTP client {name!r}; expected one of {', '.join(BACKENDS)}")
+    _choice = name
+    _backend = None
+
+
+def backend():
+    """The selected client module; requests is only imported here, on first use."""
+    global _backend
+    if _backend is None:
+        _backend = sys.modules[__name__]
+        if _choice != "stdlib":
+            try:
+                import requests
+            except ImportError:  # optional: "auto" falls back to the stdlib client
+                if _choice == "requests":
+                    raise
+            else:
+                _backend = requests
+    return _backend
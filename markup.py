@@ -1,5 +1,8 @@
 """Generate HTML markup for TRMNL e-ink display (800x480)."""
 
+import re
+from functools import lru_cache
+
 # SVG weather icons for e-ink (grayscale-friendly)
 WEATHER_ICONS = {
     "clear": """<svg viewBox="0 0 48 48" fill="none" stroke="currentColor" stroke-width="2.5">
@@ -73,68 +76,68 @@ def _icon_svg_small(icon_name):
     return _icon_svg(icon_name, size=32)
 
 
-def generate_markup(weather_data):
-    """Generate full HTML markup for TRMNL display."""
-    current = weather_data["current"]
-    hourly = weather_data["hourly"]
-    daily = weather_data["daily"]
+_SVG_OPEN_RE = re.compile(r"<svg ([^>]*)>(.*)</svg>", re.S)
+_PATH_DATA_RE = re.compile(r'\bd="([^"]*)"')
 
-    # Build hourly header labels (7 fixed-time labels on a 19-column grid)
-    chart_hours = weather_data["chart_hours"]
-    LABEL_COLS = [1, 4, 7, 10, 13, 16, 19]  # 1-indexed CSS grid-column positions
-    hourly_slots_html = ""
-    for i, h in enumerate(hourly):
-        col = LABEL_COLS[i]
-        hourly_slots_html += f"""
-            <div class="hourly-slot" style="grid-column:{col}">
-                <div class="hourly-time">{h["time"]}</div>
-                <div class="hourly-precip">{h["precipitation"]}%</div>
-            </div>"""
 
-    # Build precipitation bar chart (19 bars from chart_hours)
-    precip_bars_html = ""
-    for h in chart_hours:
-        bar_height = max(2, int((h["precipitation"] / 100) * 60))
-        precip_bars_html += f'<div class="bar-slot"><div class="bar" style="height:{bar_height}px"></div></div>'
+def _minify_path_data(d):
+    """Drop the spaces around path commands ("M12 22 Q12 15" -> "M12 22Q12 15")."""
+    return re.sub(r"\s*([A-Za-z])\s*", r"\1", d.strip())
 
-    # Build wind speed line graph SVG (19 data points from chart_hours)
-    wind_speeds = [h["wind_speed"] for h in chart_hours]
-    n = len(wind_speeds)
-    min_ws = min(wind_speeds) if wind_speeds else 0
-    max_ws = max(wind_speeds) if wind_speeds else 1
-    ws_range = max_ws - min_ws if max_ws != min_ws else 1
-    GRAPH_TOP, GRAPH_BOTTOM, SVG_H = 5, 36, 60
-    x_pos = [round((i + 0.5) / n * 700) for i in range(n)]
-    y_pos = [GRAPH_BOTTOM - round((ws - min_ws) / ws_range * (GRAPH_BOTTOM - GRAPH_TOP)) for ws in wind_speeds]
-    points_str = " ".join(f"{x_pos[i]},{y_pos[i]}" for i in range(n))
-    dots_svg = "".join(f'<circle cx="{x_pos[i]}" cy="{y_pos[i]}" r="3" fill="currentColor"/>' for i in range(n))
-    LABEL_INDICES = [0, 3, 6, 9, 12, 15, 18]
-    labels_svg = "".join(
-        f'<text x="{x_pos[i]}" y="{SVG_H - 2}" text-anchor="middle" font-size="17">{wind_speeds[i]} mph</text>'
-        for i in LABEL_INDICES if i < n
-    )
-    wind_graph_svg = (
-        f'<svg viewBox="0 0 700 {SVG_H}" width="100%" height="{SVG_H}" preserveAspectRatio="none" style="display:block">'
-        f'<polyline points="{points_str}" fill="none" stroke="currentColor" stroke-width="2"/>'
-        f'{dots_svg}{labels_svg}</svg>'
+
+_LINE_RE = re.compile(r'<line x1="([^"]*)" y1="([^"]*)" x2="([^"]*)" y2="([^"]*)"/>')
+_LINE_RUN_RE = re.compile(r'(?:<line x1="[^"]*" y1="[^"]*" x2="[^"]*" y2="[^"]*"/>)+')
+
+
+def _line_path(m):
+    """A run of plain <line>s as one <path> (same strokes, a fraction of the bytes)."""
+    d = []
+    for x1, y1, x2, y2 in _LINE_RE.findall(m.group(0)):
+        d.append(f"M{x1} {y1}" + (f"V{y2}" if x1 == x2 else f"H{x2}" if y1 == y2 else f"L{x2} {y2}"))
+    return f'<path d="{"".join(d)}"/>'
+
+
+def _minify_svg(svg):
+    """Strip inter-tag whitespace, compact path data and merge lines in an SVG fragment."""
+    svg = re.sub(r">\s+<", "><", svg.strip())
+    svg = _PATH_DATA_RE.sub(lambda m: f'd="{_minify_path_data(m.group(1))}"', svg)
+    return _LINE_RUN_RE.sub(_line_path, svg)
+
+
+def _icon_symbol(icon_name):
+    """Return an icon as a minified <symbol id="wi-NAME">.
+
+    The root <svg> presentation attributes move onto an inner <g> so they
+    still apply to the shapes when the symbol is instantiated by <use>.
+    """
+    attrs, body = _SVG_OPEN_RE.match(WEATHER_ICONS[icon_name].strip()).groups()
+    view_box = re.search(r'viewBox="([^"]*)"', attrs).group(1)
+    paint = re.sub(r'\s*viewBox="[^"]*"', "", attrs).strip()
+    return _minify_svg(f'<symbol id="wi-{icon_name}" viewBox="{view_box}"><g {paint}>{body}</g></symbol>')
+
+
+_ICON_SYMBOLS = {name: _icon_symbol(name) for name in WEATHER_ICONS}
+
+
+def _sprite_icon(icon_name, size):
+    """Return a sized container that references an icon symbol via <use>."""
+    return (
+        f'<div style="width:{size}px;height:{size}px;display:inline-block;vertical-align:middle">'
+        f'<svg viewBox="0 0 48 48"><use href="#wi-{icon_name}"/></svg></div>'
     )
 
-    # Build daily forecast
-    daily_html = ""
-    for d in daily:
-        daily_html += f"""
-            <div class="daily-slot">
-                <div class="daily-day">{d["day"]}</div>
-                <div class="daily-icon">{_icon_svg_small(d["icon"])}</div>
-                <div class="daily-temps">
-                    <span class="daily-high">{d["high"]}°</span>
-                    <span class="daily-low">{d["low"]}°</span>
-                </div>
-            </div>"""
 
-    markup = f"""<div class="weather-container">
+def _sprite_sheet(icon_names):
+    """Return a hidden <svg> defining each used icon once, in first-use order."""
+    symbols = "".join(_ICON_SYMBOLS[name] for name in dict.fromkeys(icon_names))
+    return f'<svg width="0" height="0" style="position:absolute" aria-hidden="true">{symbols}</svg>'
+
+
+# Full-page layout. Everything outside the {{ name }} slots is static and is
+# split into constant chunks once, at import (see _compile_template).
+_LAYOUT = """<div class="weather-container">
     <style>
-        .weather-container {{
+        .weather-container {
             width: 800px;
             height: 480px;
             font-family: sans-serif;
@@ -142,187 +145,371 @@ def generate_markup(weather_data):
             box-sizing: border-box;
             display: flex;
             flex-direction: column;
-        }}
+        }
 
         /* Current conditions */
-        .current-row {{
+        .current-row {
             display: flex;
             align-items: center;
             justify-content: space-between;
             margin-bottom: 10px;
-        }}
-        .current-left {{
+        }
+        .current-left {
             display: flex;
             align-items: center;
             gap: 10px;
-        }}
-        .current-temp {{
+        }
+        .current-temp {
             font-size: 72px;
             font-weight: 700;
             line-height: 1;
-        }}
-        .current-temp-symbol {{
+        }
+        .current-temp-symbol {
             font-size: 28px;
             font-weight: 400;
             vertical-align: super;
-        }}
-        .current-stats {{
+        }
+        .current-stats {
             text-align: right;
             font-size: 18px;
             line-height: 1.6;
-        }}
+        }
 
         /* Hourly section */
-        .hourly-header {{
+        .hourly-header {
             display: grid;
             grid-template-columns: repeat(19, 1fr);
             border-top: 1px solid #888;
             padding-top: 8px;
-        }}
-        .hourly-slot {{
+        }
+        .hourly-slot {
             text-align: center;
-        }}
-        .hourly-time {{
+        }
+        .hourly-time {
             font-size: 18px;
             margin-bottom: 2px;
-        }}
-        .hourly-precip {{
+        }
+        .hourly-precip {
             font-size: 16px;
             font-weight: 600;
-        }}
+        }
 
         /* Precipitation bar chart */
-        .bar-chart {{
+        .bar-chart {
             display: grid;
             grid-template-columns: repeat(19, 1fr);
             align-items: flex-end;
             height: 62px;
             margin: 2px 0;
-        }}
-        .bar-slot {{
+        }
+        .bar-slot {
             display: flex;
             justify-content: center;
             align-items: flex-end;
             height: 100%;
-        }}
-        .bar {{
+        }
+        .bar {
             width: 70%;
             background: #000;
             min-height: 2px;
-        }}
+        }
 
         /* Wind row */
-        .wind-row {{
+        .wind-row {
             padding: 6px 0;
             border-top: 1px solid #888;
             margin-top: auto;
-        }}
-        .wind-slot {{
+        }
+        .wind-slot {
             flex: 1;
             text-align: center;
-        }}
-        .wind-arrow {{
+        }
+        .wind-arrow {
             font-size: 22px;
             line-height: 1.2;
-        }}
-        .wind-speed {{
+        }
+        .wind-speed {
             font-size: 12px;
-        }}
+        }
 
         /* Daily forecast */
-        .daily-row {{
+        .daily-row {
             display: flex;
             justify-content: space-between;
             border-top: 1px solid #888;
             padding-top: 8px;
-        }}
-        .daily-slot {{
+        }
+        .daily-slot {
             flex: 1;
             text-align: center;
-        }}
-        .daily-day {{
+        }
+        .daily-day {
             font-size: 18px;
             font-weight: 600;
             margin-bottom: 4px;
-        }}
-        .daily-icon {{
+        }
+        .daily-icon {
             margin: 2px 0;
             display: flex;
             justify-content: center;
-        }}
-        .daily-icon svg {{
+        }
+        .daily-icon svg {
             width: 40px;
             height: 40px;
-        }}
-        .daily-temps {{
+        }
+        .daily-temps {
             font-size: 18px;
-        }}
-        .daily-high {{
+        }
+        .daily-high {
             font-weight: 700;
-        }}
-        .daily-low {{
+        }
+        .daily-low {
             margin-left: 4px;
             opacity: 0.6;
-        }}
-    </style>
+        }
+    </style>{{ sprites }}
+
+{{ current_row }}
+
+    <div class="hourly-header">{{ hourly_slots }}
+    </div>
+
+    <div class="bar-chart">{{ precip_bars }}
+    </div>
+
+    <div class="wind-row">{{ wind_graph }}
+    </div>
+
+    <div class="daily-row">{{ daily }}
+    </div>
+</div>"""
+
+_SLOT_RE = re.compile(r"\{\{ (\w+) \}\}")
+
+
+def _compile_template(text):
+    """Split text on {{ name }} slots into constant chunks plus slot positions.
+
+    Returns (chunks, slots): chunks holds None at each slot position and slots
+    lists (position, name) pairs to fill in before joining.
+    """
+    chunks = []
+    slots = []
+    for i, part in enumerate(_SLOT_RE.split(text)):
+        if i % 2:
+            slots.append((len(chunks), part))
+            chunks.append(None)
+        elif part:
+            chunks.append(part)
+    return chunks, slots
+
 
-    <div class="current-row">
+def _render(template, values):
+    """Fill a compiled template's slots from values and join it in one pass."""
+    chunks, slots = template
+    parts = chunks[:]
+    for pos, name in slots:
+        parts[pos] = values[name]
+    return "".join(parts)
+
+
+_LAYOUT_TEMPLATE = _compile_template(_LAYOUT)
+
+_CURRENT_TEMPLATE = _compile_template('''    <div class="current-row">
         <div class="current-left">
-            {_icon_svg(current["icon"], size=80)}
+            {{ current_icon }}
             <div class="current-temp">
-                {current["temp"]}<span class="current-temp-symbol">{current["temp_symbol"]}</span>
+                {{ temp }}<span class="current-temp-symbol">{{ temp_symbol }}</span>
             </div>
         </div>
         <div class="current-stats">
-            Feels Like: {current["feels_like"]}{current["temp_symbol"]}<br>
-            Precipitation: {current["precipitation"]}%<br>
-            Humidity: {current["humidity"]}%<br>
-            Wind: {current["wind_speed"]} {current["wind_unit"]}
+            Feels Like: {{ feels_like }}{{ temp_symbol }}<br>
+            Precipitation: {{ precipitation }}%<br>
+            Humidity: {{ humidity }}%<br>
+            Wind: {{ wind_speed }} {{ wind_unit }}
         </div>
-    </div>
+    </div>''')
 
-    <div class="hourly-header">{hourly_slots_html}
-    </div>
+# Icon containers for the two sizes the layout uses
+_ICON_HTML = {(name, size): _icon_svg(name, size) for name in WEATHER_ICONS for size in (80, 32)}
 
-    <div class="bar-chart">{precip_bars_html}
-    </div>
 
-    <div class="wind-row">{wind_graph_svg}
-    </div>
+def _precip_bar(precipitation):
+    bar_height = max(2, int((precipitation / 100) * 60))
+    return f'<div class="bar-slot"><div class="bar" style="height:{bar_height}px"></div></div>'
+
+
+# Precipitation bars for every whole-percent probability
+_BAR_HTML = {p: _precip_bar(p) for p in range(101)}
+
+# 1-indexed CSS grid-column positions of the 7 hourly labels on the 19-column grid
+_LABEL_COLS = [1, 4, 7, 10, 13, 16, 19]
+
+_WIND_GRAPH_TOP, _WIND_GRAPH_BOTTOM, _WIND_SVG_H = 5, 36, 60
+_WIND_LABEL_INDICES = [0, 3, 6, 9, 12, 15, 18]
+_wind_x_positions = {}
 
-    <div class="daily-row">{daily_html}
-    </div>
-</div>"""
 
-    return markup
+def _cached_icon(icon_name, size):
+    return _ICON_HTML.get((icon_name, size)) or _icon_svg(icon_name, size)
+
+
+def _wind_points(wind_speeds):
+    """Return the graph's x and y pixel positions for each wind speed."""
+    n = len(wind_speeds)
+    x_pos = _wind_x_positions.get(n)
+    if x_pos is None:
+        x_pos = _wind_x_positions[n] = [round((i + 0.5) / n * 700) for i in range(n)]
+    min_ws = min(wind_speeds) if wind_speeds else 0
+    max_ws = max(wind_speeds) if wind_speeds else 1
+    ws_range = max_ws - min_ws if max_ws != min_ws else 1
+    span = _WIND_GRAPH_BOTTOM - _WIND_GRAPH_TOP
+    y_pos = [_WIND_GRAPH_BOTTOM - round((ws - min_ws) / ws_range * span) for ws in wind_speeds]
+    return x_pos, y_pos
+
+
+# Section renderers are memoized on their (hashable) inputs: between refreshes,
+# and across devices sharing a location, most sections come out unchanged.
+SECTION_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def _markup_current_row(icon_html, temp, temp_symbol, feels_like, precipitation, humidity, wind_speed, wind_unit):
+    return _render(_CURRENT_TEMPLATE, {
+        "current_icon": icon_html,
+        "temp": str(temp),
+        "temp_symbol": temp_symbol,
+        "feels_like": str(feels_like),
+        "precipitation": str(precipitation),
+        "humidity": str(humidity),
+        "wind_speed": str(wind_speed),
+        "wind_unit": wind_unit,
+    })
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def _markup_hourly_header(labels):
+    """Hourly header: 7 fixed-time (time, precipitation) labels on a 19-column grid."""
+    return "".join([
+        f"""
+            <div class="hourly-slot" style="grid-column:{col}">
+                <div class="hourly-time">{time}</div>
+                <div class="hourly-precip">{precipitation}%</div>
+            </div>"""
+        for col, (time, precipitation) in zip(_LABEL_COLS, labels)
+    ])
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def _markup_precip_bars(precipitations):
+    return "".join([_BAR_HTML.get(p) or _precip_bar(p) for p in precipitations])
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def _markup_wind_graph(wind_speeds, wind_unit):
+    """Build the wind speed line graph SVG (19 data points from chart_hours)."""
+    x_pos, y_pos = _wind_points(wind_speeds)
+    points_str = " ".join([f"{x},{y}" for x, y in zip(x_pos, y_pos)])
+    dots_svg = "".join([f'<circle cx="{x}" cy="{y}" r="3" fill="currentColor"/>' for x, y in zip(x_pos, y_pos)])
+    label_y = _WIND_SVG_H - 2
+    labels_svg = "".join([
+        f'<text x="{x_pos[i]}" y="{label_y}" text-anchor="middle" font-size="17">{wind_speeds[i]} {wind_unit}</text>'
+        for i in _WIND_LABEL_INDICES if i < len(wind_speeds)
+    ])
+    return (
+        f'<svg viewBox="0 0 700 {_WIND_SVG_H}" width="100%" height="{_WIND_SVG_H}" preserveAspectRatio="none" style="display:block">'
+        f'<polyline points="{points_str}" fill="none" stroke="currentColor" stroke-width="2"/>'
+        f'{dots_svg}{labels_svg}</svg>'
+    )
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def _markup_daily(days, sprites):
+    """Daily row from (day, icon, high, low) tuples."""
+    return "".join([
+        f"""
+            <div class="daily-slot">
+                <div class="daily-day">{day}</div>
+                <div class="daily-icon">{_sprite_icon(icon, 32) if sprites else _cached_icon(icon, 32)}</div>
+                <div class="daily-temps">
+                    <span class="daily-high">{high}°</span>
+                    <span class="daily-low">{low}°</span>
+                </div>
+            </div>"""
+        for day, icon, high, low in days
+    ])
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def _markup_sprite_sheet(icon_names):
+    return "\n    " + _sprite_sheet(icon_names)
+
+
+def clear_section_caches():
+    """Empty the memoized section renderers (benchmarks time uncached renders with this)."""
+    for renderer in (_markup_current_row, _markup_hourly_header, _markup_precip_bars, _markup_wind_graph,
+                     _markup_daily, _markup_sprite_sheet, _wind_graph_svg):
+        renderer.cache_clear()
+
+
+def _sprite_name(icon_name):
+    return icon_name if icon_name in WEATHER_ICONS else "clear"
+
+
+def generate_markup(weather_data, sprites=False):
+    """Generate full HTML markup for TRMNL display.
+
+    With ``sprites=True`` each icon used on the page is emitted once as a
+    minified ``<symbol>`` and every slot references it with ``<use>``,
+    instead of inlining the full SVG per slot.
+    """
+    current = weather_data["current"]
+    chart_hours = weather_data["chart_hours"]
+    days = tuple([(d["day"], d["icon"], d["high"], d["low"]) for d in weather_data["daily"]])
+
+    if sprites:
+        current_name = _sprite_name(current["icon"])
+        days = tuple([(day, _sprite_name(icon), high, low) for day, icon, high, low in days])
+        sprite_sheet = _markup_sprite_sheet((current_name,) + tuple([d[1] for d in days]))
+        current_icon = _sprite_icon(current_name, 80)
+    else:
+        sprite_sheet = ""
+        current_icon = _cached_icon(current["icon"], 80)
+
+    return _render(_LAYOUT_TEMPLATE, {
+        "sprites": sprite_sheet,
+        "current_row": _markup_current_row(
+            current_icon, current["temp"], current["temp_symbol"], current["feels_like"],
+            current["precipitation"], current["humidity"], current["wind_speed"], current["wind_unit"],
+        ),
+        "hourly_slots": _markup_hourly_header(
+            tuple([(h["time"], h["precipitation"]) for h in weather_data["hourly"]])
+        ),
+        "precip_bars": _markup_precip_bars(tuple([h["precipitation"] for h in chart_hours])),
+        "wind_graph": _markup_wind_graph(tuple([h["wind_speed"] for h in chart_hours]), current["wind_unit"]),
+        "daily": _markup_daily(days, sprites),
+    })
 
 
 def _build_wind_graph_svg(chart_hours, wind_unit):
     """Build a compact wind speed SVG line graph for the Liquid template."""
-    wind_speeds = [h["wind_speed"] for h in chart_hours]
-    n = len(wind_speeds)
+    return _wind_graph_svg(tuple([h["wind_speed"] for h in chart_hours]), wind_unit)
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def _wind_graph_svg(wind_speeds, wind_unit):
     if not wind_speeds:
         return ""
-    min_ws = min(wind_speeds)
-    max_ws = max(wind_speeds)
-    ws_range = max_ws - min_ws if max_ws != min_ws else 1
-    GRAPH_TOP, GRAPH_BOTTOM, SVG_H = 5, 36, 60
-    x_pos = [round((i + 0.5) / n * 700) for i in range(n)]
-    y_pos = [GRAPH_BOTTOM - round((ws - min_ws) / ws_range * (GRAPH_BOTTOM - GRAPH_TOP))
-             for ws in wind_speeds]
-    points_str = " ".join(f"{x_pos[i]},{y_pos[i]}" for i in range(n))
+    x_pos, y_pos = _wind_points(wind_speeds)
+    points_str = " ".join([f"{x},{y}" for x, y in zip(x_pos, y_pos)])
     # Dots only at the 7 labeled positions to keep SVG compact
-    LABEL_INDICES = [0, 3, 6, 9, 12, 15, 18]
-    dots = "".join(
-        f'<circle cx="{x_pos[i]}" cy="{y_pos[i]}" r="3"/>'
-        for i in LABEL_INDICES if i < n
-    )
-    labels = "".join(
-        f'<text x="{x_pos[i]}" y="{SVG_H - 2}">{wind_speeds[i]} {wind_unit}</text>'
-        for i in LABEL_INDICES if i < n
-    )
+    labeled = [i for i in _WIND_LABEL_INDICES if i < len(wind_speeds)]
+    dots = "".join([f'<circle cx="{x_pos[i]}" cy="{y_pos[i]}" r="3"/>' for i in labeled])
+    labels = "".join([
+        f'<text x="{x_pos[i]}" y="{_WIND_SVG_H - 2}">{wind_speeds[i]} {wind_unit}</text>' for i in labeled
+    ])
     return (
-        f'<svg viewBox="0 0 700 {SVG_H}" width="100%" height="{SVG_H}"'
+        f'<svg viewBox="0 0 700 {_WIND_SVG_H}" width="100%" height="{_WIND_SVG_H}"'
         f' preserveAspectRatio="none" style="display:block">'
         f'<polyline points="{points_str}" fill="none" stroke="currentColor" stroke-width="2"/>'
         f'<g fill="currentColor">{dots}</g>'
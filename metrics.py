@@ -0,0 +1,148 @@
+"""Minimal Prometheus-style metrics (counters and histograms) for the server.
+
+Metrics register themselves in REGISTRY on creation; ``render()`` returns
+the Prometheus text exposition format served at /metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        # (name, value) pairs added to every sample, e.g. the worker of a pre-forked server
+        self.const_labels = ()
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return all metrics in Prometheus text format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(self.const_labels))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self, const_labels=()):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(const_labels + key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block, in seconds (also on error)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self, const_labels=()):
+        with self._lock:
+            items = sorted((const_labels + key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(float(bound)))])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "trmnl_stage_duration_seconds", "Time spent per pipeline stage (fetch, parse, render, raster, diff, post); fetch also by source (api, cache).",
+)
+CACHE_REQUESTS = Counter(
+    "trmnl_cache_requests_total", "Forecast cache lookups by result (hit, miss, stale).",
+)
+UPSTREAM_ERRORS = Counter(
+    "trmnl_upstream_errors_total", "Failed calls to upstream services (open_meteo, trmnl).",
+)
+HTTP_RESPONSES = Counter(
+    "trmnl_http_responses_total", "Responses sent by the polling server, by path and status code.",
+)
+RESPONSE_BYTES = Histogram(
+    "trmnl_response_size_bytes", "Body size of markup responses, by content-coding.",
+    buckets=(0, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+
+
+def render():
+    return REGISTRY.render()
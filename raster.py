@@ -0,0 +1,552 @@
+"""Rasterize the weather layout to an 800x480 1- or 2-bit grayscale PNG/BMP.
+
+Draws the same layout as markup.generate_markup straight into a bytearray
+framebuffer, without a browser: icons are stroked from the WEATHER_ICONS SVGs,
+text uses an embedded 5x7 bitmap font, and grays (borders, faded strokes) are
+ordered-dithered down to the output depth. Frames are cached on the values
+they show, so every device sharing a forecast gets the same encoded bytes.
+"""
+
+import math
+import re
+import struct
+import zlib
+from functools import lru_cache
+
+from markup import WEATHER_ICONS
+
+WIDTH, HEIGHT = 800, 480
+WHITE, BLACK = 255, 0
+BORDER_GRAY = 0x88
+
+# Encoded frames kept per (frame inputs, format, bit depth)
+FRAME_CACHE_SIZE = 64
+
+# 5x7 font (classic glcdfont) for ASCII 0x20-0x7E: 5 columns per glyph, bit 0
+# is the top row and bit 7 the descender row.
+_FONT_DATA = (
+    "0000000000" "00005f0000" "0007000700" "147f147f14" "242a7f2a12" "2313086462" "3649562050" "0008070300"
+    "001c224100" "0041221c00" "2a1c7f1c2a" "08083e0808" "0080703000" "0808080808" "0000606000" "2010080402"
+    "3e5149453e" "00427f4000" "7249494946" "2141494d33" "1814127f10" "2745454539" "3c4a494931" "4121110907"
+    "3649494936" "464949291e" "0000140000" "0040340000" "0008142241" "1414141414" "0041221408" "0201590906"
+    "3e415d594e" "7c1211127c" "7f49494936" "3e41414122" "7f4141413e" "7f49494941" "7f09090901" "3e41415173"
+    "7f0808087f" "00417f4100" "2040413f01" "7f08142241" "7f40404040" "7f021c027f" "7f0408107f" "3e4141413e"
+    "7f09090906" "3e4151215e" "7f09192946" "2649494932" "03017f0103" "3f4040403f" "1f2040201f" "3f4038403f"
+    "6314081463" "0304780403" "6159494d43" "007f414141" "0204081020" "004141417f" "0402010204" "4040404040"
+    "0003070800" "2054547840" "7f28444438" "3844444428" "384444287f" "3854545418" "00087e0902" "18a4a49c78"
+    "7f08040478" "00447d4000" "2040403d00" "7f10284400" "00417f4000" "7c0478047c" "7c08040478" "3844444438"
+    "fc18242418" "18242418fc" "7c08040408" "4854545424" "04043f4424" "3c4040207c" "1c2040201c" "3c4030403c"
+    "4428102844" "4c9090907c" "4464544c44" "0008364100" "0000770000" "0041360800" "0201020402"
+)
+_FONT = {chr(0x20 + i): bytes.fromhex(_FONT_DATA[i * 10:i * 10 + 10]) for i in range(len(_FONT_DATA) // 10)}
+_FONT["°"] = bytes.fromhex("0006090906")
+
+
+def _bayer(n):
+    """n x n ordered-dither matrix with values 0..n*n-1."""
+    matrix = [[0]]
+    while len(matrix) < n:
+        size = len(matrix)
+        matrix = [
+            [4 * matrix[y % size][x % size] + (0, 2, 3, 1)[(y // size) * 2 + x // size] for x in range(2 * size)]
+            for y in range(2 * size)
+        ]
+    return matrix
+
+
+_BAYER = _bayer(8)
+
+
+def _level(gray, rank, bits):
+    """Output level (0 = black) for a gray value at a dither-matrix rank."""
+    top = (1 << bits) - 1
+    return min(top, int(gray * top / 255 + (rank + 0.5) / 64))
+
+
+# translate() tables per bit depth, row phase and column phase: map a gray byte
+# to its output level, already shifted into its position within the packed byte
+_PACK_TABLES = {
+    bits: [
+        [
+            bytes(_level(g, _BAYER[r][c], bits) << (bits * (8 // bits - 1 - c % (8 // bits))) for g in range(256))
+            for c in range(8)
+        ]
+        for r in range(8)
+    ]
+    for bits in (1, 2)
+}
+
+
+def dither(gray, bits=1):
+    """Ordered-dither an 8-bit framebuffer to packed 1- or 2-bit rows (MSB = leftmost pixel)."""
+    if bits not in (1, 2):
+        raise ValueError(f"Unsupported bit depth: {bits}")
+    per_byte = 8 // bits
+
+    # Pixels x, x+8, x+16... share a column phase, so each phase is one slice and
+    # one translate(); the phases' bits are disjoint, so adding the slices as big
+    # integers packs them. At 2 bits a byte covers only 4 of the 8 phases, so even
+    # and odd bytes are packed separately and interleaved.
+    row_bytes = WIDTH // per_byte
+    groups = 8 // per_byte
+    out = bytearray(row_bytes * HEIGHT)
+    for y in range(HEIGHT):
+        row = gray[y * WIDTH:(y + 1) * WIDTH]
+        tables = _PACK_TABLES[bits][y % 8]
+        offset = y * row_bytes
+        for k in range(groups):
+            acc = 0
+            for c in range(k * per_byte, (k + 1) * per_byte):
+                acc += int.from_bytes(row[c::8].translate(tables[c]), "big")
+            out[offset + k:offset + row_bytes:groups] = acc.to_bytes(WIDTH // 8, "big")
+    return bytes(out)
+
+
+def encode_png(packed, bits=1):
+    """Encode packed rows as a grayscale PNG."""
+    row_bytes = WIDTH * bits // 8
+    raw = b"".join(b"\x00" + packed[y * row_bytes:(y + 1) * row_bytes] for y in range(HEIGHT))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", WIDTH, HEIGHT, bits, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+# 2-bit bytes (4 pixels) split into two 4-bit bytes for BMP, which has no 2-bit mode
+_NIBBLES_HI = bytes(((b >> 6) << 4) | ((b >> 4) & 3) for b in range(256))
+_NIBBLES_LO = bytes((((b >> 2) & 3) << 4) | (b & 3) for b in range(256))
+
+
+def encode_bmp(packed, bits=1):
+    """Encode packed rows as a bottom-up BMP (1-bit, or 4-bit with a 4-gray palette for bits=2)."""
+    if bits == 2:
+        expanded = bytearray(len(packed) * 2)
+        expanded[0::2] = packed.translate(_NIBBLES_HI)
+        expanded[1::2] = packed.translate(_NIBBLES_LO)
+        packed, file_bits = bytes(expanded), 4
+    else:
+        file_bits = 1
+    levels = 1 << bits
+    palette = b"".join(bytes((v, v, v, 0)) for v in (i * 255 // (levels - 1) for i in range(levels)))
+    row_bytes = WIDTH * file_bits // 8
+    stride = (row_bytes + 3) & ~3
+    pad = b"\x00" * (stride - row_bytes)
+    pixels = b"".join(packed[y * row_bytes:(y + 1) * row_bytes] + pad for y in range(HEIGHT - 1, -1, -1))
+    offset = 14 + 40 + len(palette)
+    return (
+        struct.pack("<2sIHHI", b"BM", offset + len(pixels), 0, 0, offset)
+        + struct.pack("<IiiHHIIiiII", 40, WIDTH, HEIGHT, 1, file_bits, 0, len(pixels), 2835, 2835, levels, levels)
+        + palette
+        + pixels
+    )
+
+
+# Shapes are drawn as cached run lists: (dy, x0, x1, value) horizontal spans
+# relative to the shape's top-left corner, blitted with slice assignment.
+
+def _runs_from_bitmap(width, height, pixels):
+    """Convert a width*height bytearray (WHITE = transparent) into spans."""
+    runs = []
+    for y in range(height):
+        row = pixels[y * width:(y + 1) * width]
+        x = 0
+        while x < width:
+            value = row[x]
+            if value == WHITE:
+                x += 1
+                continue
+            end = x + 1
+            while end < width and row[end] == value:
+                end += 1
+            runs.append((y, x, end, value))
+            x = end
+    return runs
+
+
+@lru_cache(maxsize=512)
+def _text_runs(text, scale, bold=False):
+    """Spans for a string in the bitmap font; returns (width, runs)."""
+    columns = []
+    for ch in text:
+        columns.extend(_FONT.get(ch, _FONT["?"]))
+        columns.append(0)
+    if columns:
+        columns.pop()
+    # Bold widens every span to the right by a third of a font pixel (at least 1px)
+    extra = max(1, scale // 3) if bold else 0
+    runs = []
+    for row in range(8):
+        x = 0
+        while x < len(columns):
+            if not columns[x] >> row & 1:
+                x += 1
+                continue
+            end = x + 1
+            while end < len(columns) and columns[end] >> row & 1:
+                end += 1
+            for dy in range(scale):
+                runs.append((row * scale + dy, x * scale, end * scale + extra, BLACK))
+            x = end
+    return len(columns) * scale + extra, tuple(runs)
+
+
+_ELEMENT_RE = re.compile(r"<(circle|line|path|polyline)\b([^>]*)/>")
+_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+_PATH_TOKEN_RE = re.compile(r"[MLQCZmlqcz]|-?\d*\.?\d+")
+
+
+def _flatten_path(d):
+    """Absolute M/L/Q/C/Z path data to a list of polylines (curves flattened)."""
+    polylines, points = [], []
+    tokens = _PATH_TOKEN_RE.findall(d)
+    i, command = 0, None
+
+    def take(count):
+        nonlocal i
+        values = [float(v) for v in tokens[i:i + count]]
+        i += count
+        return values
+
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i].upper()
+            i += 1
+        if command == "Z":
+            if points:
+                points.append(points[0])
+                polylines.append(points)
+            points = []
+            command = None
+        elif command == "M":
+            if len(points) > 1:
+                polylines.append(points)
+            points = [tuple(take(2))]
+            command = "L"
+        elif command == "L":
+            points.append(tuple(take(2)))
+        elif command in ("Q", "C"):
+            controls = [points[-1]] + [tuple(take(2)) for _ in range(2 if command == "Q" else 3)]
+            for step in range(1, 9):
+                t = step / 8
+                pts = controls
+                while len(pts) > 1:
+                    pts = [(a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t) for a, b in zip(pts, pts[1:])]
+                points.append(pts[0])
+        else:
+            i += 1
+    if len(points) > 1:
+        polylines.append(points)
+    return polylines
+
+
+def _stroke(pixels, size, polyline, half_width, value):
+    """Mark pixels whose centers lie within half_width of the polyline."""
+    for (ax, ay), (bx, by) in zip(polyline, polyline[1:]):
+        dx, dy = bx - ax, by - ay
+        length2 = dx * dx + dy * dy or 1e-9
+        x0 = max(0, int(min(ax, bx) - half_width))
+        x1 = min(size - 1, int(max(ax, bx) + half_width) + 1)
+        y0 = max(0, int(min(ay, by) - half_width))
+        y1 = min(size - 1, int(max(ay, by) + half_width) + 1)
+        limit = half_width * half_width
+        for y in range(y0, y1 + 1):
+            py = y + 0.5
+            for x in range(x0, x1 + 1):
+                px = x + 0.5
+                t = min(1.0, max(0.0, ((px - ax) * dx + (py - ay) * dy) / length2))
+                ex, ey = ax + t * dx - px, ay + t * dy - py
+                if ex * ex + ey * ey <= limit and pixels[y * size + x] > value:
+                    pixels[y * size + x] = value
+
+
+def _unit_circle(steps):
+    return [(math.cos(2 * math.pi * k / steps), math.sin(2 * math.pi * k / steps)) for k in range(steps + 1)]
+
+
+_UNIT_CIRCLE = _unit_circle(48)
+
+
+@lru_cache(maxsize=64)
+def _icon_runs(icon_name, size):
+    """Spans for a WEATHER_ICONS icon stroked at size x size pixels."""
+    svg = WEATHER_ICONS.get(icon_name, WEATHER_ICONS["clear"])
+    root = dict(_ATTR_RE.findall(svg[:svg.index(">")]))
+    scale = size / float(root.get("viewBox", "0 0 48 48").split()[2])
+    pixels = bytearray([WHITE]) * (size * size)
+    for tag, attr_text in _ELEMENT_RE.findall(svg):
+        attrs = dict(_ATTR_RE.findall(attr_text))
+        a = {k: float(v) for k, v in attrs.items() if k in ("cx", "cy", "r", "x1", "y1", "x2", "y2")}
+        if tag == "circle":
+            polylines = [[
+                (a["cx"] + a["r"] * _UNIT_CIRCLE[k][0], a["cy"] + a["r"] * _UNIT_CIRCLE[k][1]) for k in range(49)
+            ]]
+        elif tag == "line":
+            polylines = [[(a["x1"], a["y1"]), (a["x2"], a["y2"])]]
+        elif tag == "polyline":
+            values = [float(v) for v in re.split(r"[\s,]+", attrs["points"].strip())]
+            polylines = [list(zip(values[0::2], values[1::2]))]
+        else:
+            polylines = _flatten_path(attrs["d"])
+        half_width = float(attrs.get("stroke-width", root.get("stroke-width", 1))) * scale / 2
+        value = round(WHITE * (1 - float(attrs.get("opacity", 1))))
+        for polyline in polylines:
+            _stroke(pixels, size, [(x * scale, y * scale) for x, y in polyline], half_width, value)
+    return tuple(_runs_from_bitmap(size, size, pixels))
+
+
+class Canvas:
+    """An 8-bit grayscale framebuffer (255 = white)."""
+
+    def __init__(self):
+        self.pixels = bytearray([WHITE]) * (WIDTH * HEIGHT)
+
+    def fill_rect(self, x0, y0, x1, y1, value=BLACK):
+        x0, x1 = max(0, int(x0)), min(WIDTH, int(x1))
+        if x1 <= x0:
+            return
+        span = bytes([value]) * (x1 - x0)
+        for y in range(max(0, int(y0)), min(HEIGHT, int(y1))):
+            self.pixels[y * WIDTH + x0:y * WIDTH + x1] = span
+
+    def blit(self, runs, x, y, value=None):
+        """Draw spans at (x, y); value overrides each span's own gray."""
+        x, y = int(x), int(y)
+        for dy, x0, x1, span_value in runs:
+            row = y + dy
+            if 0 <= row < HEIGHT:
+                left, right = max(0, x + x0), min(WIDTH, x + x1)
+                if right > left:
+                    start = row * WIDTH
+                    self.pixels[start + left:start + right] = bytes([span_value if value is None else value]) * (right - left)
+
+    def text(self, x, y, text, scale=2, anchor="start", bold=False, value=BLACK):
+        """Draw text with its top edge at y; returns the drawn width."""
+        width, runs = _text_runs(text, scale, bold)
+        if anchor == "middle":
+            x -= width / 2
+        elif anchor == "end":
+            x -= width
+        self.blit(runs, round(x), y, value)
+        return width
+
+    def icon(self, x, y, icon_name, size):
+        self.blit(_icon_runs(icon_name, size), x, y)
+
+    def polyline(self, points, width=2, value=BLACK):
+        """Stroke a polyline with square-ended segments (drawn as thin runs)."""
+        half = width / 2
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            steps = max(abs(bx - ax), abs(by - ay), 1)
+            for i in range(int(steps) + 1):
+                px = ax + (bx - ax) * i / steps
+                py = ay + (by - ay) * i / steps
+                self.fill_rect(px - half, py - half, px + half, py + half, value)
+
+    def disc(self, cx, cy, r, value=BLACK):
+        for dy in range(-r, r + 1):
+            dx = int((r * r - dy * dy) ** 0.5 + 0.5)
+            self.fill_rect(cx - dx, cy + dy, cx + dx + 1, cy + dy + 1, value)
+
+
+def frame_key(weather_data):
+    """Hashable tuple of everything the frame shows (the render cache key)."""
+    current = weather_data["current"]
+    chart_hours = weather_data["chart_hours"]
+    return (
+        (current["icon"], current["temp"], current["temp_symbol"], current["feels_like"],
+         current["precipitation"], current["humidity"], current["wind_speed"], current["wind_unit"]),
+        tuple([(h["time"], h["precipitation"]) for h in weather_data["hourly"]]),
+        tuple([h["precipitation"] for h in chart_hours]),
+        tuple([h["wind_speed"] for h in chart_hours]),
+        tuple([(d["day"], d["icon"], d["high"], d["low"]) for d in weather_data["daily"]]),
+    )
+
+
+# Layout geometry, matching the CSS in markup._LAYOUT (16px/20px padding)
+_LEFT, _RIGHT, _TOP, _BOTTOM = 20, 780, 16, 464
+_CONTENT_W = _RIGHT - _LEFT
+_COLUMN_W = _CONTENT_W / 19
+_LABEL_COLS = [1, 4, 7, 10, 13, 16, 19]
+_HOURLY_TOP = 141
+_BARS_BOTTOM = 257
+_WIND_TOP, _WIND_H = 300, 60
+_DAILY_TOP = 366
+
+
+def draw_frame(key):
+    """Draw a frame_key's values into a new Canvas."""
+    current, hourly, precipitations, wind_speeds, days = key
+    icon, temp, temp_symbol, feels_like, precipitation, humidity, wind_speed, wind_unit = current
+    canvas = Canvas()
+
+    # Current conditions: icon and big temperature on the left, stats on the right
+    canvas.icon(_LEFT, 33, icon, 80)
+    temp_width = canvas.text(_LEFT + 90, 41, str(temp), scale=9, bold=True)
+    canvas.text(_LEFT + 90 + temp_width + 6, 41, temp_symbol, scale=3)
+    stats = [
+        f"Feels Like: {feels_like}{temp_symbol}",
+        f"Precipitation: {precipitation}%",
+        f"Humidity: {humidity}%",
+        f"Wind: {wind_speed} {wind_unit}",
+    ]
+    for i, line in enumerate(stats):
+        canvas.text(_RIGHT, 23 + 29 * i, line, anchor="end")
+
+    # Hourly labels and precipitation bars on the 19-column grid
+    canvas.fill_rect(_LEFT, _HOURLY_TOP, _RIGHT, _HOURLY_TOP + 1, BORDER_GRAY)
+    for col, (time, precip) in zip(_LABEL_COLS, hourly):
+        center = _LEFT + (col - 0.5) * _COLUMN_W
+        canvas.text(center, _HOURLY_TOP + 9, time, anchor="middle")
+        canvas.text(center, _HOURLY_TOP + 32, f"{precip}%", anchor="middle", bold=True)
+    bar_w = _COLUMN_W * 0.7
+    for i, precip in enumerate(precipitations):
+        center = _LEFT + (i + 0.5) * _COLUMN_W
+        height = max(2, int(precip / 100 * 60))
+        canvas.fill_rect(round(center - bar_w / 2), _BARS_BOTTOM - height, round(center + bar_w / 2), _BARS_BOTTOM)
+
+    # Wind graph, stretched from the 700-wide SVG viewBox like preserveAspectRatio="none"
+    canvas.fill_rect(_LEFT, _WIND_TOP - 6, _RIGHT, _WIND_TOP - 5, BORDER_GRAY)
+    if wind_speeds:
+        n = len(wind_speeds)
+        low, high = min(wind_speeds), max(wind_speeds)
+        spread = high - low if high != low else 1
+        points = [
+            (_LEFT + (i + 0.5) / n * _CONTENT_W, _WIND_TOP + 36 - round((ws - low) / spread * 31))
+            for i, ws in enumerate(wind_speeds)
+        ]
+        canvas.polyline(points)
+        for x, y in points:
+            canvas.disc(round(x), y, 3)
+        for i in range(0, n, 3):
+            canvas.text(points[i][0], _WIND_TOP + _WIND_H - 16, f"{wind_speeds[i]} {wind_unit}", anchor="middle")
+
+    # Daily forecast columns
+    canvas.fill_rect(_LEFT, _DAILY_TOP, _RIGHT, _DAILY_TOP + 1, BORDER_GRAY)
+    day_w = _CONTENT_W / max(1, len(days))
+    for i, (day, day_icon, high_temp, low_temp) in enumerate(days):
+        center = _LEFT + (i + 0.5) * day_w
+        canvas.text(center, _DAILY_TOP + 9, day, anchor="middle", bold=True)
+        canvas.icon(round(center) - 20, _DAILY_TOP + 34, day_icon, 40)
+        high_text, low_text = f"{high_temp}°", f"{low_temp}°"
+        high_w = _text_runs(high_text, 2, True)[0]
+        total = high_w + 8 + _text_runs(low_text, 2)[0]
+        left = center - total / 2
+        canvas.text(left, _DAILY_TOP + 80, high_text, bold=True)
+        canvas.text(left + high_w + 8, _DAILY_TOP + 80, low_text, value=0x66)
+    return canvas
+
+
+@lru_cache(maxsize=8)
+def _framebuffer(key):
+    return bytes(draw_frame(key).pixels)
+
+
+@lru_cache(maxsize=FRAME_CACHE_SIZE)
+def _packed_cached(key, bits):
+    return dither(_framebuffer(key), bits)
+
+
+_ENCODERS = {"png": encode_png, "bmp": encode_bmp}
+
+
+@lru_cache(maxsize=FRAME_CACHE_SIZE)
+def _render_cached(key, fmt, bits):
+    return _ENCODERS[fmt](_packed_cached(key, bits), bits)
+
+
+def _check_bits(bits):
+    if bits not in (1, 2):
+        raise ValueError(f"Unsupported bit depth: {bits}")
+
+
+def render_frame(weather_data, bits=1):
+    """Render parsed weather data to packed 1- or 2-bit rows (the input to diff_frames)."""
+    _check_bits(bits)
+    return _packed_cached(frame_key(weather_data), bits)
+
+
+def render_image(weather_data, fmt="png", bits=1):
+    """Render parsed weather data to PNG or BMP bytes at 1 or 2 bits per pixel."""
+    if fmt not in _ENCODERS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    _check_bits(bits)
+    return _render_cached(frame_key(weather_data), fmt, bits)
+
+
+# Dirty rectangles are built from DIFF_TILE-pixel-wide columns (a whole number of
+# bytes at either depth), so each one can be cut straight out of the packed rows.
+DIFF_TILE = 16
+# Changes this many tiles apart (or rows apart, vertically) share a rectangle
+DIFF_GAP_TILES = 2
+DIFF_GAP_ROWS = 8
+
+
+def _changed_tiles(old_row, new_row, tile_bytes):
+    """Runs [first, last] of tile indices that differ between two packed rows."""
+    xor = (int.from_bytes(old_row, "big") ^ int.from_bytes(new_row, "big")).to_bytes(len(new_row), "big")
+    zero = bytes(tile_bytes)
+    runs = []
+    for t in range(len(new_row) // tile_bytes):
+        if xor[t * tile_bytes:(t + 1) * tile_bytes] != zero:
+            if runs and t - runs[-1][1] <= DIFF_GAP_TILES:
+                runs[-1][1] = t
+            else:
+                runs.append([t, t])
+    return runs
+
+
+def diff_frames(old, new, bits=1):
+    """Bounding rectangles (x, y, w, h) of the pixels that differ between two packed frames.
+
+    Unchanged rows are skipped with a plain bytes comparison; changed rows are
+    XORed as big integers and scanned a tile at a time. Nearby changes are merged
+    so a redrawn label comes back as one rectangle, not one per glyph stroke.
+    """
+    _check_bits(bits)
+    row_bytes = WIDTH * bits // 8
+    tile_bytes = DIFF_TILE * bits // 8
+    if old == new:
+        return []
+    if len(old) != len(new):
+        return [(0, 0, WIDTH, HEIGHT)]
+
+    closed = []
+    active = []  # [first tile, last tile, first row, last row]
+    for y in range(HEIGHT):
+        start = y * row_bytes
+        old_row, new_row = old[start:start + row_bytes], new[start:start + row_bytes]
+        if old_row != new_row:
+            for first, last in _changed_tiles(old_row, new_row, tile_bytes):
+                rect = [first, last, y, y]
+                # Absorb every active rectangle this run touches (including ones
+                # already extended by earlier runs on this row)
+                keep = []
+                for other in active:
+                    if other[0] - DIFF_GAP_TILES <= rect[1] and rect[0] <= other[1] + DIFF_GAP_TILES:
+                        rect = [min(rect[0], other[0]), max(rect[1], other[1]), min(rect[2], other[2]), y]
+                    else:
+                        keep.append(other)
+                active = keep + [rect]
+        still_active = []
+        for rect in active:
+            (still_active if y - rect[3] < DIFF_GAP_ROWS else closed).append(rect)
+        active = still_active
+    closed.extend(active)
+    return sorted(
+        (first * DIFF_TILE, top, (last - first + 1) * DIFF_TILE, bottom - top + 1)
+        for first, last, top, bottom in closed
+    )
+
+
+def crop_frame(packed, rect, bits=1):
+    """Packed rows of one diff_frames rectangle, top to bottom."""
+    x, y, w, h = rect
+    row_bytes = WIDTH * bits // 8
+    left, width = x * bits // 8, w * bits // 8
+    return b"".join(packed[(y + dy) * row_bytes + left:(y + dy) * row_bytes + left + width] for dy in range(h))
@@ -0,0 +1,64 @@
+"""Adaptive refresh scheduling: refetch volatile forecasts sooner, calm ones later.
+
+A forecast's volatility is scored from its next few hours (precipitation
+probability swings, weather condition changes, temperature moves) and mapped
+onto a refresh interval between a configured minimum and maximum.
+"""
+
+from datetime import datetime
+
+from weather import WEATHER_CODE_MAP, _find_current_hour_index
+
+# Hours of the hourly series, from the current hour, that are scored
+HORIZON_HOURS = 12
+
+# Change that counts as fully volatile, per signal
+PRECIP_SWING = 40  # percentage points between consecutive hours
+CONDITION_CHANGES = 3  # icon changes across the horizon
+TEMP_DELTA_C = 5.0  # degrees Celsius between consecutive hours (fronts, not the daily cycle)
+
+
+def _condition(code):
+    return WEATHER_CODE_MAP.get(code, ("", "clear"))[1]
+
+
+def _max_step(values):
+    """Largest absolute change between consecutive non-missing values."""
+    present = [v for v in values if v is not None]
+    return max((abs(b - a) for a, b in zip(present, present[1:])), default=0)
+
+
+def volatility(raw, now=None, horizon_hours=HORIZON_HOURS):
+    """Score how fast a raw Open-Meteo forecast is changing, from 0 (calm) to 1.
+
+    The score is the strongest of three signals over the next ``horizon_hours``:
+    the biggest hour-to-hour precipitation probability swing, the number of
+    weather condition changes, and the steepest hourly temperature change. Any
+    thunderstorm in the window scores 1.
+    """
+    hourly = raw.get("hourly") or {}
+    times = hourly.get("time") or []
+    if not times:
+        return 1.0
+    start = _find_current_hour_index(times, now or datetime.now())
+    window = slice(start, start + horizon_hours + 1)
+
+    precip = _max_step(hourly.get("precipitation_probability", [])[window]) / PRECIP_SWING
+
+    conditions = [_condition(c) for c in hourly.get("weather_code", [])[window] if c is not None]
+    if "thunderstorm" in conditions:
+        return 1.0
+    changes = sum(1 for a, b in zip(conditions, conditions[1:]) if a != b) / CONDITION_CHANGES
+
+    temp_step = _max_step(hourly.get("temperature_2m", [])[window])
+    if "F" in (raw.get("hourly_units") or {}).get("temperature_2m", ""):
+        temp_step /= 1.8
+    temp = temp_step / TEMP_DELTA_C
+
+    return min(1.0, max(precip, changes, temp))
+
+
+def refresh_interval(raw, now=None, min_seconds=3600, max_seconds=6 * 3600):
+    """Seconds until a forecast should be refetched, between min_seconds and max_seconds."""
+    score = volatility(raw, now)
+    return max_seconds - score * (max_seconds - min_seconds)
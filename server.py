@@ -2,20 +2,56 @@
 
 Modes:
   python server.py --once   Generate HTML to docs/index.html and exit (used by GitHub Actions)
+  python server.py --once --locations locations.json
+                            Generate docs/<name>/index.html and merge_variables.json
+                            for every location in the file, in parallel
   python server.py          Run a local HTTP polling server on PORT (for local testing)
+  python server.py --workers 4
+                            Same, pre-forked across 4 processes sharing one cache
 """
 
 import argparse
+import base64
+import gzip
+import hashlib
+import json
 import logging
 import os
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
 import time
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
-import requests
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
 
 import config
-from weather import fetch_weather, parse_weather_data
+import http_client
+from cache import DiskCache, LeaderLock, SharedSlot, StaleWhileRevalidateCache, atomic_write, write_if_changed
+from delivery import WebhookDelivery
+from history import FIELDS as HISTORY_FIELDS, HistoryStore
+import metrics
+from metrics import (
+    CACHE_REQUESTS, HTTP_RESPONSES, RESPONSE_BYTES, STAGE_SECONDS, UPSTREAM_ERRORS,
+    render as render_metrics,
+)
+from weather import fetch_weather, fetch_weather_batch, parse_weather_batch, parse_weather_data
 from markup import generate_markup, build_merge_variables
+from scheduler import refresh_interval
+
+# raster (which builds its font and dither tables at import) and the process
+# pool are imported where used, keeping them off the --once startup path, as are
+# requests and NumPy by http_client and weather (see benchmarks/startup.py)
+http_client.use(config.HTTP_CLIENT)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,107 +59,820 @@ logging.basicConfig(
 )
 log = logging.getLogger(__name__)
 
+# Start refreshing the in-memory forecast this fraction of its TTL early
+REFRESH_AHEAD = 0.1
 
-def fetch_data():
-    """Fetch and parse weather data."""
-    log.info("Fetching weather data for (%.4f, %.4f)...", config.LATITUDE, config.LONGITUDE)
-    raw = fetch_weather(
-        config.LATITUDE, config.LONGITUDE,
-        config.TEMPERATURE_UNIT, config.WIND_SPEED_UNIT,
+
+def forecast_ttl(raw, fetched_at):
+    """Seconds a forecast fetched at ``fetched_at`` (epoch seconds) is reused.
+
+    Markup is re-rendered from it hourly either way; volatile forecasts are
+    refetched sooner (see scheduler.refresh_interval).
+    """
+    return refresh_interval(
+        raw, datetime.fromtimestamp(fetched_at),
+        min_seconds=config.FORECAST_MIN_AGE_HOURS * 3600,
+        max_seconds=config.FORECAST_MAX_AGE_HOURS * 3600,
     )
-    data = parse_weather_data(raw, config.TEMPERATURE_UNIT, config.WIND_SPEED_UNIT)
+
+# Stored forecasts expire just before the in-memory refresh-ahead point, so a
+# background refresh always reaches the API instead of re-reading the same file.
+# Both lifetimes count from the API fetch (the file's mtime), also after a restart.
+forecast_cache = DiskCache(
+    config.CACHE_DIR,
+    ttl=lambda raw, stored_at: forecast_ttl(raw, stored_at) * (1 - REFRESH_AHEAD),
+    max_bytes=config.CACHE_MAX_BYTES,
+)
+
+webhook_delivery = WebhookDelivery(
+    config.TRMNL_API_KEY,
+    url_template=config.TRMNL_API_URL.rstrip("/") + "/api/custom_plugins/{plugin_uuid}",
+    workers=config.WEBHOOK_WORKERS,
+    rate_per_host=config.WEBHOOK_RATE_PER_HOST,
+    max_attempts=config.WEBHOOK_MAX_ATTEMPTS,
+    deadline=config.WEBHOOK_DEADLINE_SECONDS,
+    dead_letter_path=config.WEBHOOK_DEAD_LETTER_PATH,
+)
+
+
+def fetch_forecast():
+    """Fetch the raw Open-Meteo forecast for the configured location.
+
+    Returns (raw, epoch seconds when it was fetched from the API); a forecast
+    read from forecast_cache may be hours old.
+    """
+    log.info("Fetching weather data for (%.4f, %.4f)...", config.LATITUDE, config.LONGITUDE)
+    requested_at = time.time()
+    start = time.perf_counter()
+    source = "api"
+    try:
+        raw, fetched_at = fetch_weather(
+            config.LATITUDE, config.LONGITUDE,
+            cache=forecast_cache, base_url=config.OPEN_METEO_URL,
+            grid_resolution=config.GRID_RESOLUTION_DEG, with_fetched_at=True,
+        )
+        # Disk cache hits are timed apart from API calls, which take 1000x longer
+        if fetched_at < requested_at:
+            source = "cache"
+    except Exception:
+        UPSTREAM_ERRORS.inc(upstream="open_meteo")
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="fetch", source=source)
+    return raw, fetched_at
+
+
+def parse_forecast(raw, now=None):
+    """Parse a raw forecast as of ``now`` (default: the current time)."""
+    with STAGE_SECONDS.time(stage="parse"):
+        data = parse_weather_data(raw, config.TEMPERATURE_UNIT, config.WIND_SPEED_UNIT, now=now)
     log.info("Current: %s°, %s", data["current"]["temp"], data["current"]["description"])
     return data
 
 
-def build_markup():
-    """Fetch weather data and return generated HTML markup."""
-    data = fetch_data()
-    return generate_markup(data)
+def fetch_data():
+    """Fetch and parse weather data, recording it in the forecast history."""
+    now = datetime.now()
+    raw, _ = fetch_forecast()
+    data = parse_forecast(raw, now)
+    record_history((config.LATITUDE, config.LONGITUDE), data, now)
+    return data
 
 
-def post_to_trmnl(merge_variables):
-    """POST merge_variables to TRMNL webhook API."""
-    if not config.TRMNL_PLUGIN_UUID:
-        log.warning("TRMNL_PLUGIN_UUID not set, skipping webhook POST")
-        return
+_history = None
+_history_lock = threading.Lock()
+
+
+def forecast_history():
+    """The HistoryStore of parsed forecasts, opened on first use."""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = HistoryStore(
+                config.HISTORY_PATH, hours=config.HISTORY_HOURS, max_locations=config.HISTORY_MAX_LOCATIONS,
+            )
+        return _history
+
+
+def record_history(location, data, now=None):
+    """Add parsed data for a (lat, lon) location to the history; failures are only logged."""
+    try:
+        forecast_history().record(location, data, now)
+    except Exception:
+        log.exception("Failed to record forecast history")
+
+
+def history_window(hours=48, now=None):
+    """The configured location's last ``hours`` of recorded values, per history field."""
+    history = forecast_history()
+    location = (config.LATITUDE, config.LONGITUDE)
+    now = now or datetime.now()
+    temp_symbol, wind_unit = history.units()
+    return {
+        "latitude": config.LATITUDE,
+        "longitude": config.LONGITUDE,
+        "end": now.strftime("%Y-%m-%dT%H:00"),
+        "hours": hours,
+        "temp_symbol": temp_symbol,
+        "wind_unit": wind_unit,
+        "series": {field: history.series(location, field, hours, now) for field in HISTORY_FIELDS},
+    }
+
+
+def render_markup(data):
+    """Generate the display markup for parsed weather data."""
+    with STAGE_SECONDS.time(stage="render"):
+        return generate_markup(data, sprites=config.SVG_SPRITES)
+
+
+def render_bitmap(data, fmt="png", bits=1):
+    """Rasterize parsed weather data to an 800x480 PNG or BMP."""
+    from raster import render_image
+
+    with STAGE_SECONDS.time(stage="raster"):
+        return render_image(data, fmt, bits)
+
+
+def diff_frame_rects(old, new, bits=1):
+    """Changed rectangles between two packed frames."""
+    from raster import diff_frames
 
-    url = f"https://usetrmnl.com/api/custom_plugins/{config.TRMNL_PLUGIN_UUID}"
-    headers = {"Authorization": f"Bearer {config.TRMNL_API_KEY}"}
-    payload = {"merge_variables": merge_variables}
+    with STAGE_SECONDS.time(stage="diff"):
+        return diff_frames(old, new, bits)
 
-    log.info("Posting merge_variables to TRMNL webhook...")
-    resp = requests.post(url, json=payload, headers=headers, timeout=30)
-    log.info("TRMNL response: %s %s", resp.status_code, resp.text[:200])
-    resp.raise_for_status()
 
+def fetch_data_batch(locations):
+    """Fetch and parse weather data for a list of (latitude, longitude) pairs.
 
-def run_once(output_path="docs/index.html"):
-    """Generate HTML, write to output_path, and POST to TRMNL webhook."""
+    Locations whose forecast could not be fetched get None.
+    """
+    log.info("Fetching weather data for %d locations...", len(locations))
+
+    def chunk_failed(exc):
+        UPSTREAM_ERRORS.inc(upstream="open_meteo")
+        log.error("Forecast fetch failed for a chunk of locations, skipping them: %s", exc)
+
+    raws = fetch_weather_batch(
+        locations, cache=forecast_cache, base_url=config.OPEN_METEO_URL,
+        grid_resolution=config.GRID_RESOLUTION_DEG, on_error=chunk_failed,
+    )
+    # Locations in the same grid cell share one response; parse it once so they
+    # also share the parsed data (and with it the memoized markup and frames)
+    now = datetime.now()
+    unique = {id(raw): raw for raw in raws if raw is not None}
+    parsed = dict(zip(unique, parse_weather_batch(
+        list(unique.values()), config.TEMPERATURE_UNIT, config.WIND_SPEED_UNIT, now,
+    )))
+    log.info("%d locations share %d forecasts", len(locations), len(unique))
+    datas = [parsed.get(id(raw)) for raw in raws]
+    # /history.json serves only the configured location, so only it is recorded
+    configured = (config.LATITUDE, config.LONGITUDE)
+    for location, data in zip(locations, datas):
+        if location == configured and data is not None:
+            record_history(location, data, now)
+    return datas
+
+
+def _payload_hash(merge_variables):
+    """Stable content hash of a merge_variables dict."""
+    canonical = json.dumps(merge_variables, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _load_webhook_state():
+    """Return {plugin_uuid: payload hash} of the last successful POSTs."""
+    try:
+        with open(config.WEBHOOK_STATE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_webhook_state(state):
+    atomic_write(config.WEBHOOK_STATE_PATH, json.dumps(state, indent=2, sort_keys=True).encode("utf-8"))
+
+
+def post_changed(payloads, force=False):
+    """POST each {plugin_uuid: merge_variables} item that changed since its last successful POST.
+
+    Unchanged payloads are skipped unless ``force`` is set. Changed ones go
+    through webhook_delivery concurrently. Returns (sent, skipped, failed) counts.
+    """
+    state = _load_webhook_state()
+    digests = {uuid: _payload_hash(mv) for uuid, mv in payloads.items()}
+    changed = {uuid: mv for uuid, mv in payloads.items() if force or state.get(uuid) != digests[uuid]}
+    skipped = len(payloads) - len(changed)
+    if skipped:
+        log.info("Merge variables unchanged since last POST for %d plugin(s), skipping", skipped)
+
+    if not changed:
+        return 0, skipped, 0
+
+    log.info("Posting merge_variables to %d TRMNL plugin(s)...", len(changed))
+    with STAGE_SECONDS.time(stage="post"):
+        results = webhook_delivery.deliver_all(changed)
+    sent = [r.plugin_uuid for r in results if r.ok]
+    if len(sent) < len(results):
+        UPSTREAM_ERRORS.inc(len(results) - len(sent), upstream="trmnl")
+    if sent:
+        state = _load_webhook_state()
+        state.update({uuid: digests[uuid] for uuid in sent})
+        _save_webhook_state(state)
+    return len(sent), skipped, len(results) - len(sent)
+
+
+def run_once(output_path="docs/index.html", force=False):
+    """Generate HTML, write to output_path, and POST to TRMNL webhook.
+
+    The POST is skipped when the merge variables match the last successful
+    one, unless ``force`` is set. Returns the number of failed deliveries.
+    """
     data = fetch_data()
-    markup = generate_markup(data)
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(markup)
-    log.info("Wrote %d bytes to %s", len(markup), output_path)
+    markup = render_markup(data)
+    if write_if_changed(output_path, markup.encode("utf-8")):
+        log.info("Wrote %d bytes to %s", len(markup), output_path)
+    else:
+        log.info("%s unchanged", output_path)
 
     # Send merge variables to TRMNL webhook
+    if not config.TRMNL_PLUGIN_UUID:
+        log.warning("TRMNL_PLUGIN_UUID not set, skipping webhook POST")
+        return 0
+    sent, skipped, failed = post_changed({config.TRMNL_PLUGIN_UUID: build_merge_variables(data)}, force=force)
+    log.info("Webhook POSTs: %d sent, %d skipped, %d failed", sent, skipped, failed)
+    return failed
+
+
+def load_locations(path):
+    """Read a JSON list of {"name", "latitude", "longitude"[, "plugin_uuid"]} objects.
+
+    Each name becomes an output directory, so it must be unique and a single
+    path component. Coordinates are range-checked here, since Open-Meteo
+    rejects a whole batch request over one invalid pair.
+    """
+    with open(path, encoding="utf-8") as f:
+        locations = json.load(f)
+    names = set()
+    for location in locations:
+        name = location.get("name", "")
+        if not name or name in (".", "..") or "/" in name or os.sep in name or name in names:
+            raise ValueError(f"Invalid or duplicate location name {name!r} in {path}")
+        names.add(name)
+        location["latitude"] = float(location["latitude"])
+        location["longitude"] = float(location["longitude"])
+        if not (-90 <= location["latitude"] <= 90 and -180 <= location["longitude"] <= 180):
+            raise ValueError(f"Location {name!r} in {path} has coordinates out of range: "
+                             f"({location['latitude']}, {location['longitude']})")
+    return locations
+
+
+def _render_locations(data, directories):
+    """Render one parsed forecast and write it to each of its locations' directories.
+
+    Runs in a pool worker. Returns (merge_variables, files written).
+    """
+    markup = generate_markup(data, sprites=config.SVG_SPRITES).encode("utf-8")
     merge_vars = build_merge_variables(data)
-    post_to_trmnl(merge_vars)
+    merge_json = (json.dumps(merge_vars, indent=2, sort_keys=True, ensure_ascii=False) + "\n").encode("utf-8")
+    written = 0
+    for directory in directories:
+        written += write_if_changed(os.path.join(directory, "index.html"), markup)
+        written += write_if_changed(os.path.join(directory, "merge_variables.json"), merge_json)
+    return merge_vars, written
+
+
+def run_once_batch(locations_path, output_dir="docs", force=False, workers=config.ONCE_WORKERS):
+    """Generate a page and merge variables per location and POST the changed ones.
+
+    Forecasts are fetched in one batch; each distinct forecast is rendered once
+    across ``workers`` processes (0 = one per CPU). Files are written
+    atomically and only when their content changed, so unchanged locations
+    leave no diff. Locations whose forecast could not be fetched keep their
+    previous files. Returns the number of such locations plus failed deliveries.
+    """
+    locations = load_locations(locations_path)
+    datas = fetch_data_batch([(loc["latitude"], loc["longitude"]) for loc in locations])
+    unfetched = [loc["name"] for loc, data in zip(locations, datas) if data is None]
+    if unfetched:
+        log.error("No forecast for %d location(s), leaving their pages as they were: %s",
+                  len(unfetched), ", ".join(unfetched))
+
+    # Locations sharing a forecast (same grid cell) share one render
+    groups = {}
+    for location, data in zip(locations, datas):
+        if data is not None:
+            groups.setdefault(id(data), (data, []))[1].append(location)
+    jobs = [(data, [os.path.join(output_dir, loc["name"]) for loc in group]) for data, group in groups.values()]
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    with STAGE_SECONDS.time(stage="render"):
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(workers) as pool:
+                results = list(pool.map(_render_locations, *zip(*jobs), chunksize=max(1, len(jobs) // (workers * 4))))
+        else:
+            results = [_render_locations(data, directories) for data, directories in jobs]
+    rendered = len(locations) - len(unfetched)
+    written = sum(count for _, count in results)
+    log.info("Rendered %d forecasts for %d locations; %d of %d files changed",
+             len(jobs), rendered, written, 2 * rendered)
+
+    payloads = {}
+    for (_, group), (merge_vars, _) in zip(groups.values(), results):
+        payloads.update({loc["plugin_uuid"]: merge_vars for loc in group if loc.get("plugin_uuid")})
+    if not payloads:
+        return len(unfetched)
+    sent, skipped, failed = post_changed(payloads, force=force)
+    log.info("Webhook POSTs: %d sent, %d skipped, %d failed", sent, skipped, failed)
+    return len(unfetched) + failed
+
+
+class EncodedBody:
+    """A markup string with its UTF-8, gzip and (optionally) brotli encodings and ETag.
 
+    Built once per render so polls only pick a precomputed variant.
+    """
 
-# Simple in-memory cache for the polling server
-_cached_markup = None
-_cache_time = 0
-CACHE_TTL = config.UPDATE_INTERVAL_HOURS * 3600
+    def __init__(self, markup, encodings=None):
+        self.markup = markup
+        self.identity = markup.encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.identity).hexdigest()[:32] + '"'
+        if encodings is not None:  # already compressed elsewhere (pre-fork leader)
+            self.encodings = encodings
+            return
+        self.encodings = {"gzip": gzip.compress(self.identity, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encodings["br"] = brotli.compress(self.identity, quality=11)
+
+
+UNAVAILABLE_BODY = EncodedBody("<div>Weather data unavailable</div>")
+
+
+class ImageBody:
+    """An encoded frame with its content type and ETag."""
+
+    CONTENT_TYPES = {"png": "image/png", "bmp": "image/bmp"}
+
+    def __init__(self, payload, fmt):
+        self.payload = payload
+        self.content_type = self.CONTENT_TYPES[fmt]
+        self.etag = '"' + hashlib.sha256(payload).hexdigest()[:32] + '"'
+
+# In-memory cache for the polling server: serves the last good raw forecast
+# while a single background refresh runs, starting shortly before the TTL
+# expires. Markup is re-rendered from it whenever the clock enters a new hour.
+_raw_forecast = StaleWhileRevalidateCache(
+    fetch_forecast, forecast_ttl, refresh_ahead=REFRESH_AHEAD,
+    on_access=lambda result: CACHE_REQUESTS.inc(result=result), timestamped=True,
+)
+_render_lock = threading.Lock()
+_rendered_forecast = None
+_rendered_hour = None
+_rendered_data = None
+_cached_body = None
+_image_bodies = {}  # (format, bits) -> ImageBody for _rendered_data
+_frames = {}  # bits -> (frame id, packed rows) for _rendered_data
+# Frames recently served, by id, so a device can ask for what changed since its own
+RECENT_FRAMES = 16
+_recent_frames = OrderedDict()
+
+
+def get_body_cached(record=True):
+    """Return the EncodedBody for the current hour's markup.
+
+    ``record=False`` leaves the cache request metrics alone (leader ticks).
+    """
+    global _rendered_forecast, _rendered_hour, _rendered_data, _cached_body
+    if _shared_slot is not None and not _leader_lock.held:
+        return _follow_shared(record)
+    raw = _raw_forecast.get(record)
+    if raw is None:
+        return _cached_body or UNAVAILABLE_BODY
+
+    now = datetime.now()
+    hour = now.strftime("%Y-%m-%dT%H")
+    with _render_lock:
+        if raw is not _rendered_forecast or hour != _rendered_hour:
+            try:
+                data = parse_forecast(raw, now)
+                markup = render_markup(data)
+                if _cached_body is None or markup != _cached_body.markup:
+                    _cached_body = EncodedBody(markup)
+                _rendered_forecast, _rendered_hour, _rendered_data = raw, hour, data
+                _image_bodies.clear()
+                _frames.clear()
+            except Exception:
+                log.exception("Failed to render weather data")
+            else:
+                record_history((config.LATITUDE, config.LONGITUDE), data, now)
+        return _cached_body or UNAVAILABLE_BODY
 
 
 def get_markup_cached():
-    global _cached_markup, _cache_time
-    now = time.time()
-    if _cached_markup is None or (now - _cache_time) > CACHE_TTL:
+    return get_body_cached().markup
+
+
+def get_image_cached(fmt="png", bits=1):
+    """Return the ImageBody for the current frame, or None if there is no data yet."""
+    get_body_cached()
+    with _render_lock:
+        if _rendered_data is None:
+            return None
+        body = _image_bodies.get((fmt, bits))
+        if body is None:
+            body = _image_bodies[(fmt, bits)] = ImageBody(render_bitmap(_rendered_data, fmt, bits), fmt)
+        return body
+
+
+def get_frame_cached(bits=1):
+    """Return (frame id, packed rows) for the current frame, or None if there is no data yet."""
+    from raster import render_frame
+
+    get_body_cached()
+    with _render_lock:
+        if _rendered_data is None:
+            return None
+        frame = _frames.get(bits)
+        if frame is None:
+            with STAGE_SECONDS.time(stage="raster"):
+                packed = render_frame(_rendered_data, bits)
+            frame_id = f"{bits}-" + hashlib.sha256(packed).hexdigest()[:16]
+            frame = _frames[bits] = (frame_id, packed)
+        _recent_frames[frame[0]] = frame[1]
+        _recent_frames.move_to_end(frame[0])
+        while len(_recent_frames) > RECENT_FRAMES:
+            _recent_frames.popitem(last=False)
+        return frame
+
+
+def frame_update(since, bits=1):
+    """Partial-update payload taking a device from frame ``since`` to the current one.
+
+    Returns None if there is no data yet. If ``since`` is not a recent frame the
+    payload carries the whole frame as a single rectangle (``full`` is true).
+    """
+    from raster import HEIGHT, WIDTH, crop_frame
+
+    frame = get_frame_cached(bits)
+    if frame is None:
+        return None
+    frame_id, packed = frame
+    with _render_lock:
+        previous = _recent_frames.get(since) if since else None
+    if previous is None:
+        rects = [(0, 0, WIDTH, HEIGHT)]
+    else:
+        rects = diff_frame_rects(previous, packed, bits)
+    return {
+        "frame": frame_id,
+        "since": since if previous is not None else None,
+        "full": previous is None,
+        "width": WIDTH,
+        "height": HEIGHT,
+        "bits": bits,
+        "rects": [
+            {"x": x, "y": y, "w": w, "h": h,
+             "data": base64.b64encode(crop_frame(packed, (x, y, w, h), bits)).decode("ascii")}
+            for x, y, w, h in rects
+        ],
+    }
+
+
+# Pre-fork mode (--workers N): the worker holding the leader lock fetches and
+# renders as usual and publishes each new result to a memory-mapped slot; the
+# other workers serve whatever is in the slot and never call upstream.
+LEADER_TICK_SECONDS = 5
+_shared_slot = None
+_leader_lock = None
+_shared_generation = 0
+
+
+def _pack_shared(body, raw, hour):
+    parts = [
+        body.identity, body.encodings["gzip"], body.encodings.get("br", b""),
+        json.dumps(raw, separators=(",", ":")).encode("utf-8"), hour.encode("ascii"),
+    ]
+    return b"".join(struct.pack("<I", len(part)) + part for part in parts)
+
+
+def _unpack_shared(payload):
+    parts, offset = [], 0
+    while offset < len(payload):
+        (length,) = struct.unpack_from("<I", payload, offset)
+        parts.append(payload[offset + 4:offset + 4 + length])
+        offset += 4 + length
+    return parts
+
+
+def _follow_shared(record=True):
+    """Serve the leader's published render, reloading it when the slot changes.
+
+    Counted as a cache hit, or a miss while nothing has been published yet.
+    """
+    global _shared_generation, _rendered_hour, _rendered_data, _cached_body
+    generation = _shared_slot.generation()
+    # Odd while the leader writes (or forever, if it died mid-write, until the
+    # next leader publishes): keep serving the previous render meanwhile
+    if generation % 2 == 0 and generation != _shared_generation:
+        with _render_lock:
+            generation, payload = _shared_slot.read()
+            if payload is not None and generation != _shared_generation:
+                identity, gzipped, brotli_body, raw, hour = _unpack_shared(payload)
+                encodings = {"gzip": gzipped}
+                if brotli_body:
+                    encodings["br"] = brotli_body
+                _cached_body = EncodedBody(identity.decode("utf-8"), encodings)
+                # Parsed here too, for /image.* and /image.diff
+                _rendered_data = parse_forecast(json.loads(raw))
+                _rendered_hour = hour.decode("ascii")
+                _image_bodies.clear()
+                _frames.clear()
+                _shared_generation = generation
+    if record:
+        CACHE_REQUESTS.inc(result="hit" if _cached_body is not None else "miss")
+    return _cached_body or UNAVAILABLE_BODY
+
+
+def _lead_forever():
+    """Worker thread: try to become leader; once leading, keep the shared render fresh.
+
+    Polls may land on any worker, so the leader renders on a timer rather than
+    on its own requests (which would leave the slot stale while it gets none).
+    """
+    published = None
+    while True:
         try:
-            _cached_markup = build_markup()
-            _cache_time = now
+            if _leader_lock.try_acquire():
+                body = get_body_cached(record=False)
+                state = (body, _rendered_forecast, _rendered_hour)
+                if _rendered_forecast is not None and state != published:
+                    _shared_slot.publish(_pack_shared(body, _rendered_forecast, _rendered_hour))
+                    published = state
+                    log.info("Worker %d published a render to the shared cache", os.getpid())
         except Exception:
-            log.exception("Failed to fetch weather data")
-            if _cached_markup is None:
-                _cached_markup = "<div>Weather data unavailable</div>"
-    return _cached_markup
+            log.exception("Leader refresh failed")
+        time.sleep(LEADER_TICK_SECONDS)
+
+
+def _etag_matches(header, etag):
+    """Check an If-None-Match header value against an ETag (weak comparison)."""
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _preferred_encoding(header, available):
+    """Pick the best content-coding from an Accept-Encoding header, or None for identity."""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for name in ("br", "gzip"):
+        if name in available and accepted.get(name, accepted.get("*", 0)) > 0:
+            return name
+    return None
 
 
 class WeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; with Nagle on, a keep-alive client's
+    # delayed ACK stalls every response by ~40ms
+    disable_nagle_algorithm = True
+
     def do_GET(self):
-        markup = get_markup_cached()
-        body = markup.encode("utf-8")
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            self._send_metrics()
+            return
+        if url.path in ("/image.png", "/image.bmp"):
+            bits = 2 if parse_qs(url.query).get("bits") == ["2"] else 1
+            self._send_image(url.path, url.path.rsplit(".", 1)[1], bits)
+            return
+        if url.path == "/history.json":
+            self._send_history(parse_qs(url.query).get("hours", ["48"])[0])
+            return
+        if url.path == "/image.diff":
+            query = parse_qs(url.query)
+            bits = 2 if query.get("bits") == ["2"] else 1
+            self._send_frame_update(query.get("since", [None])[0], bits)
+            return
+
+        body = get_body_cached()
+        if _etag_matches(self.headers.get("If-None-Match", ""), body.etag):
+            self.send_response(304)
+            self.send_header("ETag", body.etag)
+            self.end_headers()
+            HTTP_RESPONSES.inc(path="/", code="304")
+            return
+
+        encoding = _preferred_encoding(self.headers.get("Accept-Encoding", ""), body.encodings)
+        payload = body.encodings[encoding] if encoding else body.identity
         self.send_response(200)
         self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("ETag", body.etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(payload)
+        HTTP_RESPONSES.inc(path="/", code="200")
+        RESPONSE_BYTES.observe(len(payload), encoding=encoding or "identity")
+
+    def _send_image(self, path, fmt, bits):
+        body = get_image_cached(fmt, bits)
+        if body is None:
+            self.send_error(503, "Weather data unavailable")
+            HTTP_RESPONSES.inc(path=path, code="503")
+            return
+        if _etag_matches(self.headers.get("If-None-Match", ""), body.etag):
+            self.send_response(304)
+            self.send_header("ETag", body.etag)
+            self.end_headers()
+            HTTP_RESPONSES.inc(path=path, code="304")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", body.content_type)
+        self.send_header("Content-Length", str(len(body.payload)))
+        self.send_header("ETag", body.etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body.payload)
+        HTTP_RESPONSES.inc(path=path, code="200")
+
+    def _send_frame_update(self, since, bits):
+        path = "/image.diff"
+        frame = get_frame_cached(bits)
+        if frame is not None and _etag_matches(self.headers.get("If-None-Match", ""), f'"{frame[0]}"'):
+            self.send_response(304)
+            self.send_header("ETag", f'"{frame[0]}"')
+            self.end_headers()
+            HTTP_RESPONSES.inc(path=path, code="304")
+            return
+        update = frame_update(since, bits)
+        if update is None:
+            self.send_error(503, "Weather data unavailable")
+            HTTP_RESPONSES.inc(path=path, code="503")
+            return
+
+        payload = json.dumps(update, separators=(",", ":")).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("ETag", f'"{update["frame"]}"')
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(payload)
+        HTTP_RESPONSES.inc(path=path, code="200")
+
+    def _send_history(self, hours):
+        try:
+            hours = min(max(int(hours), 1), config.HISTORY_HOURS)
+        except ValueError:
+            hours = 48
+        body = json.dumps(history_window(hours), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
         self.end_headers()
         self.wfile.write(body)
+        HTTP_RESPONSES.inc(path="/history.json", code="200")
+
+    def _send_metrics(self):
+        payload = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        HTTP_RESPONSES.inc(path="/metrics", code="200")
 
     def log_message(self, fmt, *args):
         log.info("Poll: " + fmt, *args)
 
 
+class PollingHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 overflows when many devices poll at
+    # once, and the dropped SYNs are only retransmitted after 1-3 s
+    request_queue_size = socket.SOMAXCONN
+
+
 def run_server():
     """Run a local HTTP server for testing."""
     get_markup_cached()  # warm up cache
-    server = HTTPServer(("0.0.0.0", config.PORT), WeatherHandler)
-    log.info("Serving on http://localhost:%d  (cache TTL: %dh)", config.PORT, config.UPDATE_INTERVAL_HOURS)
+    server = PollingHTTPServer(("0.0.0.0", config.PORT), WeatherHandler)
+    log.info("Serving on http://localhost:%d  (forecast refresh: %g-%gh)",
+             config.PORT, config.FORECAST_MIN_AGE_HOURS, config.FORECAST_MAX_AGE_HOURS)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Shutting down.")
+
+
+def _run_worker(server, slot_path):
+    """Body of a forked worker: attach to the shared slot, then serve polls."""
+    global _shared_slot, _leader_lock
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Each worker keeps its own metrics and a scrape reaches any one of them;
+    # the label keeps their counters apart so none looks like a reset
+    metrics.REGISTRY.const_labels = (("worker", str(os.getpid())),)
+    _shared_slot = SharedSlot(slot_path)
+    _leader_lock = LeaderLock(slot_path + ".lock")
+    threading.Thread(target=_lead_forever, name="leader", daemon=True).start()
     try:
         server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def run_prefork(workers):
+    """Serve polls from ``workers`` forked processes sharing one listening socket.
+
+    Only the elected leader fetches and renders; if it dies, another worker
+    takes over the lock and the parent forks a replacement.
+    """
+    server = PollingHTTPServer(("0.0.0.0", config.PORT), WeatherHandler)
+    slot_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    slot_path = config.SHARED_CACHE_PATH or os.path.join(slot_dir, f"trmnl-weather-{config.PORT}")
+    SharedSlot(slot_path, create=True)
+    forecast_history()  # mapped before forking, so followers see the leader's records
+    log.info("Serving on http://localhost:%d with %d workers (shared cache: %s)",
+             config.PORT, workers, slot_path)
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(server, slot_path)
+            finally:
+                os._exit(0)
+        return pid
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    children = {spawn() for _ in range(workers)}
+    try:
+        while True:
+            pid, status = os.wait()
+            if pid in children:
+                children.discard(pid)
+                log.warning("Worker %d exited (status %d); starting a new one", pid, status)
+                children.add(spawn())
     except KeyboardInterrupt:
         log.info("Shutting down.")
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        for path in (slot_path, slot_path + ".lock"):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--once", action="store_true", help="Generate HTML to docs/index.html and exit")
+    parser.add_argument("--locations", default=config.LOCATIONS_FILE,
+                        help="With --once, generate one page per location in this JSON file")
+    parser.add_argument("--force", action="store_true",
+                        help="With --once, POST to TRMNL even if the merge variables are unchanged")
+    parser.add_argument("--workers", type=int, default=config.WORKERS,
+                        help="Serve from this many forked worker processes sharing one cache")
     args = parser.parse_args()
 
     if args.once:
-        run_once()
+        failed = run_once_batch(args.locations, force=args.force) if args.locations else run_once(force=args.force)
+        # Every page that could be rendered has been written by now; the
+        # workflow commits docs/ even when this step fails
+        if failed:
+            log.error("%d location(s) or webhook delivery(s) failed; undelivered webhook payloads go to %s",
+                      failed, config.WEBHOOK_DEAD_LETTER_PATH)
+            sys.exit(1)
+    elif args.workers > 1:
+        run_prefork(args.workers)
     else:
         run_server()
 
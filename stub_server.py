@@ -0,0 +1,217 @@
+"""Local stand-in for Open-Meteo and the TRMNL webhook API (no network needed).
+
+  GET  /v1/forecast?latitude=..&longitude=..   Replays a recorded forecast per
+                                              location (comma-separated lists
+                                              return a JSON list, like Open-Meteo)
+  POST /api/custom_plugins/<uuid>             Records the webhook payload
+  GET  /stats                                 Request, error and webhook counts
+
+Forecasts come from the JSON fixtures in --fixtures (default
+benchmarks/fixtures/), picked per coordinate pair and shifted so they start
+today. Unit parameters are ignored: the fixtures are in Open-Meteo's default
+metric units, which is all weather.py requests. --latency/--jitter delay every response and --error-rate fails a
+fraction of them (with Retry-After on 429s).
+
+Usage:
+  python stub_server.py --port 8080 --latency 150 --error-rate 0.05
+  OPEN_METEO_URL=http://localhost:8080/v1/forecast TRMNL_API_URL=http://localhost:8080 \\
+      python server.py --once
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+log = logging.getLogger("stub_server")
+
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures")
+
+
+def rebase_forecast(raw, day):
+    """Return a copy of a forecast with its timestamps shifted to start on day."""
+    delta = day - datetime.fromisoformat(raw["daily"]["time"][0]).date()
+    shifted = dict(raw, hourly=dict(raw["hourly"]), daily=dict(raw["daily"]))
+    shifted["hourly"]["time"] = [
+        (datetime.fromisoformat(t) + delta).strftime("%Y-%m-%dT%H:%M") for t in raw["hourly"]["time"]
+    ]
+    shifted["daily"]["time"] = [
+        (datetime.fromisoformat(t) + delta).strftime("%Y-%m-%d") for t in raw["daily"]["time"]
+    ]
+    return shifted
+
+
+class StubState:
+    """Fixtures, fault injection settings and recorded webhooks shared by all handlers."""
+
+    def __init__(self, fixture_dir, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503, retry_after=1, record_path=None):
+        self.fixtures = []
+        for name in sorted(os.listdir(fixture_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(fixture_dir, name), encoding="utf-8") as f:
+                    self.fixtures.append(json.load(f))
+        if not self.fixtures:
+            raise SystemExit(f"No *.json fixtures in {fixture_dir}")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.record_path = record_path
+        self.webhooks = []
+        self.counts = {"forecast_requests": 0, "forecast_locations": 0, "webhook_posts": 0, "injected_errors": 0}
+        self._lock = threading.Lock()
+        self._rebased = {}
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.counts[key] += amount
+
+    def forecast_for(self, latitude, longitude):
+        """Pick a fixture deterministically from the coordinates and shift it to today."""
+        index = zlib.crc32(f"{latitude},{longitude}".encode()) % len(self.fixtures)
+        today = datetime.now().date()
+        with self._lock:
+            key = (index, today)
+            if key not in self._rebased:
+                self._rebased[key] = rebase_forecast(self.fixtures[index], today)
+            forecast = self._rebased[key]
+        return dict(forecast, latitude=latitude, longitude=longitude)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, webhooks_recorded=len(self.webhooks))
+
+    def record_webhook(self, plugin_uuid, payload):
+        record = {"time": time.time(), "plugin_uuid": plugin_uuid, "payload": payload}
+        with self._lock:
+            self.webhooks.append(record)
+            if self.record_path:
+                with open(self.record_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state = None  # set by make_server
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/stats":
+            self._send_json(200, self.state.stats())
+            return
+        if url.path != "/v1/forecast":
+            self._send_json(404, {"error": True, "reason": "Not found"})
+            return
+
+        self.state.count("forecast_requests")
+        if self._delay_or_fail():
+            return
+        query = parse_qs(url.query)
+        try:
+            latitudes = [float(v) for v in query["latitude"][0].split(",")]
+            longitudes = [float(v) for v in query["longitude"][0].split(",")]
+        except (KeyError, ValueError):
+            self._send_json(400, {"error": True, "reason": "Invalid latitude/longitude"})
+            return
+        if len(latitudes) != len(longitudes):
+            self._send_json(400, {"error": True, "reason": "Parameter count mismatch"})
+            return
+
+        self.state.count("forecast_locations", len(latitudes))
+        forecasts = [self.state.forecast_for(lat, lon) for lat, lon in zip(latitudes, longitudes)]
+        self._send_json(200, forecasts[0] if len(forecasts) == 1 else forecasts)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        prefix = "/api/custom_plugins/"
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not url.path.startswith(prefix):
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        self.state.count("webhook_posts")
+        if self._delay_or_fail():
+            return
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Invalid JSON"})
+            return
+        self.state.record_webhook(url.path[len(prefix):], payload)
+        self._send_json(200, {"message": "ok"})
+
+    def _delay_or_fail(self):
+        """Apply configured latency, then maybe send an injected error; True if one was sent."""
+        delay = self.state.latency + random.uniform(0, self.state.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() >= self.state.error_rate:
+            return False
+        self.state.count("injected_errors")
+        status = self.state.error_status
+        headers = {"Retry-After": str(self.state.retry_after)} if status == 429 else {}
+        self._send_json(status, {"error": True, "reason": "Injected error"}, headers)
+        return True
+
+    def _send_json(self, status, obj, headers=None):
+        body = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        log.debug("Stub: " + fmt, *args)
+
+
+def make_server(state, host="127.0.0.1", port=0):
+    """Create (but do not start) a stub server; port 0 picks a free port."""
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR, help="Directory of forecast JSON fixtures")
+    parser.add_argument("--latency", type=float, default=0, help="Added latency per response, in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="Extra random latency up to this many ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests to fail (0-1)")
+    parser.add_argument("--error-status", type=int, default=503, help="Status code for injected errors")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--record", help="Append received webhook payloads to this JSON-lines file")
+    args = parser.parse_args()
+
+    state = StubState(
+        args.fixtures, latency=args.latency / 1000, jitter=args.jitter / 1000,
+        error_rate=args.error_rate, error_status=args.error_status,
+        retry_after=args.retry_after, record_path=args.record,
+    )
+    server = make_server(state, args.host, args.port)
+    log.info("Stub Open-Meteo/TRMNL on http://%s:%d (%d fixtures)", args.host, args.port, len(state.fixtures))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Shutting down.")
+
+
+if __name__ == "__main__":
+    main()
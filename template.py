@@ -0,0 +1,157 @@
+"""Generate trmnl_template.html, the TRMNL Liquid template, from markup.py's icon set.
+
+Every icon in markup.WEATHER_ICONS is defined once, as a minified <symbol>
+in a hidden sprite sheet, and each icon slot is a single
+``<use href="#wi-{{ ci }}">``. That replaces the if/elsif chains of inline
+SVGs, which had to be copied by hand, so the template cannot drift from the
+Python renderer. The seven hourly and daily slots are unrolled here instead
+of being picked with {% case %} on every render. Liquid is left with plain
+substitutions and one loop over the precipitation bars.
+
+The script also reports the template size and, for each benchmark fixture,
+the webhook payload size, against budgets.
+
+Usage:
+  python template.py                  Regenerate trmnl_template.html and report sizes
+  python template.py --check          Fail if the file is out of date or over budget
+  python template.py --payload-budget 5120
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from markup import WEATHER_ICONS, _sprite_sheet, build_merge_variables
+from weather import parse_weather_data
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(ROOT, "trmnl_template.html")
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+
+# Bytes of template markup, and of the JSON body POSTed to the webhook (TRMNL
+# accepts 2 KB of merge variables per plugin, 5 KB with TRMNL+)
+TEMPLATE_BUDGET_BYTES = 8 * 1024
+PAYLOAD_BUDGET_BYTES = 2 * 1024
+
+SLOTS = 7
+
+_STYLE = """<style>
+.wc{width:100%;height:100%;font-family:sans-serif;padding:16px 20px;box-sizing:border-box;display:flex;flex-direction:column}
+.cr{display:flex;align-items:center;justify-content:space-between;margin-bottom:10px}
+.cl{display:flex;align-items:center;gap:10px}
+.ct{font-size:72px;font-weight:700;line-height:1}
+.ts{font-size:28px;font-weight:400;vertical-align:super}
+.cs{text-align:right;font-size:18px;line-height:1.6}
+.ci svg{width:80px;height:80px}
+.hh{display:grid;grid-template-columns:repeat(19,1fr);border-top:1px solid #888;padding-top:8px}
+.hs{text-align:center}
+.htl{font-size:18px;margin-bottom:2px}
+.hpv{font-size:16px;font-weight:600}
+.bc{display:grid;grid-template-columns:repeat(19,1fr);align-items:flex-end;height:62px;margin:2px 0}
+.bs{display:flex;justify-content:center;align-items:flex-end;height:100%}
+.b{width:70%;background:#000;min-height:2px}
+.wr{padding:6px 0;border-top:1px solid #888;margin-top:auto}
+.dr{display:flex;justify-content:space-between;border-top:1px solid #888;padding-top:8px}
+.ds{flex:1;text-align:center}
+.ddn{font-size:18px;font-weight:600;margin-bottom:4px}
+.dic{margin:2px 0;display:flex;justify-content:center}
+.dic svg{width:40px;height:40px}
+.dt{font-size:18px}
+.dhg{font-weight:700}
+.dlw{margin-left:4px;opacity:0.6}
+</style>"""
+
+
+def _icon(variable):
+    return f'<svg viewBox="0 0 48 48"><use href="#wi-{{{{ {variable} }}}}"/></svg>'
+
+
+def generate_template():
+    """Return the Liquid template for the short merge variables of markup.build_merge_variables."""
+    hourly = "\n".join(
+        f'<div class="hs" style="grid-column:{i * 3 + 1}"><div class="htl">{{{{ ht{i} }}}}</div>'
+        f'<div class="hpv">{{{{ hp{i} }}}}%</div></div>'
+        for i in range(SLOTS)
+    )
+    daily = "\n".join(
+        f'<div class="ds"><div class="ddn">{{{{ dd{i} }}}}</div><div class="dic">{_icon(f"di{i}")}</div>'
+        f'<div class="dt"><span class="dhg">{{{{ dh{i} }}}}&deg;</span><span class="dlw">{{{{ dl{i} }}}}&deg;</span>'
+        f'</div></div>'
+        for i in range(SLOTS)
+    )
+    return f"""<!-- Generated by template.py from markup.WEATHER_ICONS; edit those, not this file -->
+{_STYLE}
+{_sprite_sheet(list(WEATHER_ICONS))}
+<div class="wc">
+<div class="cr">
+<div class="cl"><div class="ci">{_icon("ci")}</div>
+<div class="ct">{{{{ ct }}}}<span class="ts">{{{{ cs }}}}</span></div></div>
+<div class="cs">Feels Like: {{{{ cf }}}}{{{{ cs }}}}<br>Precipitation: {{{{ cp }}}}%<br>Humidity: {{{{ ch }}}}%<br>Wind: {{{{ cw }}}} {{{{ cu }}}}</div>
+</div>
+<div class="hh">
+{hourly}
+</div>
+<div class="bc">{{% assign bars = pb | split: "," %}}{{% for bar in bars %}}<div class="bs"><div class="b" style="height:{{{{ bar }}}}px"></div></div>{{% endfor %}}</div>
+<div class="wr">{{{{ wg }}}}</div>
+<div class="dr">
+{daily}
+</div>
+</div>
+"""
+
+
+def payload_sizes():
+    """{fixture name: bytes of the webhook JSON body} for the benchmark fixtures."""
+    sizes = {}
+    for name in sorted(os.listdir(FIXTURE_DIR)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+            raw = json.load(f)
+        data = parse_weather_data(raw, now=datetime.fromisoformat(raw["daily"]["time"][0] + "T10:30"))
+        # Serialized the way delivery.py sends it (json= with default separators)
+        body = json.dumps({"merge_variables": build_merge_variables(data)}).encode("utf-8")
+        sizes[name[:-len(".json")]] = len(body)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true",
+                        help="Do not write; fail if trmnl_template.html is stale or over budget")
+    parser.add_argument("--template-budget", type=int, default=TEMPLATE_BUDGET_BYTES, help="Template bytes")
+    parser.add_argument("--payload-budget", type=int, default=PAYLOAD_BUDGET_BYTES, help="Webhook body bytes")
+    args = parser.parse_args()
+
+    template = generate_template().encode("utf-8")
+    failures = []
+    try:
+        with open(TEMPLATE_PATH, "rb") as f:
+            current = f.read()
+    except OSError:
+        current = None
+    if current != template:
+        if args.check:
+            failures.append(f"{os.path.basename(TEMPLATE_PATH)} is out of date; run python template.py")
+        else:
+            with open(TEMPLATE_PATH, "wb") as f:
+                f.write(template)
+            print(f"Wrote {TEMPLATE_PATH}")
+
+    print(f"{'template':24} {len(template):>6} B (budget {args.template_budget} B)")
+    if len(template) > args.template_budget:
+        failures.append(f"template: {len(template)} B vs budget {args.template_budget} B")
+    for name, size in payload_sizes().items():
+        print(f"{'payload[' + name + ']':24} {size:>6} B (budget {args.payload_budget} B)")
+        if size > args.payload_budget:
+            failures.append(f"payload[{name}]: {size} B vs budget {args.payload_budget} B")
+
+    if failures:
+        print("\nTemplate check failed:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from cache import SharedSlot, StaleWhileRevalidateCache
+
+
+def test_shared_slot_round_trip(tmp_path):
+    path = str(tmp_path / "slot")
+    writer = SharedSlot(path, size=4096, create=True)
+    reader = SharedSlot(path)
+    assert reader.read() == (0, None)
+    writer.publish(b"first")
+    writer.publish(b"second")
+    assert reader.read() == (4, b"second")
+
+
+def test_shared_slot_read_during_a_half_finished_publish(tmp_path):
+    path = str(tmp_path / "slot")
+    writer = SharedSlot(path, size=4096, create=True)
+    writer.publish(b"good")
+    # A writer that died between the two header writes leaves the generation odd
+    generation = writer.generation()
+    SharedSlot._HEADER.pack_into(writer._map, 0, generation + 1, 0)
+
+    reader = SharedSlot(path)
+    start = time.monotonic()
+    assert reader.read(timeout=0.05) == (generation + 1, None)
+    assert time.monotonic() - start < 1
+
+    # The next writer must leave the slot even and readable
+    SharedSlot(path).publish(b"next")
+    assert reader.generation() % 2 == 0
+    assert reader.read() == (generation + 2, b"next")
+
+
+def test_failed_cold_load_is_not_retried_by_waiting_callers():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        raise OSError("upstream down")
+
+    cache = StaleWhileRevalidateCache(loader, ttl=60, retry_interval=60, fallback="fallback")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == ["fallback"] * 5
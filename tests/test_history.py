@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from history import HistoryStore
+
+START = datetime(2026, 1, 5, 0, 0)
+HOME = (42.7728, -86.2118)
+
+
+def _data(temp, temp_symbol="°F", wind_unit="mph"):
+    return {"current": {
+        "temp": temp, "feels_like": temp - 2, "temp_symbol": temp_symbol, "precipitation": 10,
+        "humidity": 50, "wind_speed": 5, "wind_unit": wind_unit, "weather_code": 3,
+    }}
+
+
+def test_ring_wraps_and_keeps_the_last_hours():
+    store = HistoryStore(hours=24)
+    for h in range(30):
+        store.record(HOME, _data(h), START + timedelta(hours=h))
+    now = START + timedelta(hours=29)
+    assert store.series(HOME, "temp", 24, now) == list(range(6, 30))
+    # Asking for more than the window pads the front
+    assert store.series(HOME, "temp", 26, now) == [None, None] + list(range(6, 30))
+
+
+def test_skipped_hours_are_missing():
+    store = HistoryStore(hours=24)
+    store.record(HOME, _data(1), START)
+    store.record(HOME, _data(4), START + timedelta(hours=3))
+    assert store.series(HOME, "temp", 4, START + timedelta(hours=3)) == [1, None, None, 4]
+
+
+def test_gap_longer_than_the_window_clears_every_old_value():
+    store = HistoryStore(hours=24)
+    for h in range(24):
+        store.record(HOME, _data(h), START + timedelta(hours=h))
+    later = START + timedelta(hours=24 + 40)
+    store.record(HOME, _data(99), later)
+    assert store.series(HOME, "temp", 24, later) == [None] * 23 + [99]
+
+
+def test_record_older_than_the_window_is_rejected():
+    store = HistoryStore(hours=24)
+    store.record(HOME, _data(1), START + timedelta(hours=48))
+    assert store.record(HOME, _data(2), START) is False
+    assert store.series(HOME, "temp", 1, START + timedelta(hours=48)) == [1]
+
+
+def test_eviction_with_equal_hours_drops_the_least_recently_recorded():
+    store = HistoryStore(hours=24, max_locations=2)
+    a, b, c, d = (1.0, 1.0), (2.0, 2.0), (3.0, 3.0), (4.0, 4.0)
+    for location in (a, b, c):
+        store.record(location, _data(location[0]), START)
+    assert store.series(a, "temp", 1, START) == [None]
+    assert store.series(b, "temp", 1, START) == [2]
+    assert store.series(c, "temp", 1, START) == [3]
+    store.record(d, _data(4), START)
+    assert store.series(b, "temp", 1, START) == [None]
+    assert store.series(c, "temp", 1, START) == [3]
+    assert store.series(d, "temp", 1, START) == [4]
+
+
+def test_units_change_resets_the_history():
+    store = HistoryStore(hours=24)
+    store.record(HOME, _data(70), START)
+    assert store.units() == ("°F", "mph")
+    store.record(HOME, _data(21, "°C", "km/h"), START + timedelta(hours=1))
+    assert store.units() == ("°C", "km/h")
+    assert store.series(HOME, "temp", 2, START + timedelta(hours=1)) == [None, 21]
+
+
+def test_file_survives_reopen_and_layout_change_starts_over(tmp_path):
+    path = str(tmp_path / "history.bin")
+    store = HistoryStore(path, hours=24, max_locations=4)
+    store.record(HOME, _data(70), START)
+    store.close()
+    reopened = HistoryStore(path, hours=24, max_locations=4)
+    assert reopened.series(HOME, "temp", 1, START) == [70]
+    reopened.close()
+    resized = HistoryStore(path, hours=48, max_locations=4)
+    assert resized.series(HOME, "temp", 1, START) == [None]
+    resized.close()
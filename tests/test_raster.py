@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from raster import HEIGHT, WIDTH, crop_frame, diff_frames
+
+
+def _apply(old, rects, new, bits):
+    """Copy each rectangle of new onto old the way a device would."""
+    frame = bytearray(old)
+    row_bytes = WIDTH * bits // 8
+    for x, y, w, h in rects:
+        rows = crop_frame(new, (x, y, w, h), bits)
+        width = w * bits // 8
+        for dy in range(h):
+            start = (y + dy) * row_bytes + x * bits // 8
+            frame[start:start + width] = rows[dy * width:(dy + 1) * width]
+    return bytes(frame)
+
+
+@pytest.mark.parametrize("bits", [1, 2])
+def test_diff_and_crop_reconstruct_the_new_frame(bits):
+    rng = random.Random(bits)
+    size = WIDTH * HEIGHT * bits // 8
+    old = bytes(rng.getrandbits(8) for _ in range(size))
+    new = bytearray(old)
+    # Scattered single bytes, a block, and the last byte of the frame
+    for _ in range(40):
+        new[rng.randrange(size)] ^= 0xFF
+    row_bytes = WIDTH * bits // 8
+    for y in range(100, 140):
+        new[y * row_bytes + 20:y * row_bytes + 60] = bytes(40)
+    new[-1] ^= 0x01
+    new = bytes(new)
+
+    rects = diff_frames(old, new, bits)
+    assert rects
+    for x, y, w, h in rects:
+        assert 0 <= x and x + w <= WIDTH and 0 <= y and y + h <= HEIGHT
+    assert _apply(old, rects, new, bits) == new
+
+
+def test_identical_frames_have_no_rects():
+    frame = bytes(WIDTH * HEIGHT // 8)
+    assert diff_frames(frame, frame) == []
@@ -0,0 +1,49 @@
+import copy
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from weather import parse_weather_batch, parse_weather_data
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+
+
+def _fixture(name="clear"):
+    with open(os.path.join(FIXTURE_DIR, f"{name}.json"), encoding="utf-8") as f:
+        raw = json.load(f)
+    return raw, datetime.fromisoformat(raw["daily"]["time"][0] + "T10:30")
+
+
+def test_fixtures_are_metric():
+    raw, _ = _fixture()
+    assert raw["hourly_units"]["temperature_2m"] == "°C"
+    assert raw["hourly_units"]["wind_speed_10m"] == "km/h"
+
+
+def test_metric_response_converts_to_display_units():
+    raw, now = _fixture()
+    celsius = parse_weather_data(raw, "celsius", "kmh", now)
+    fahrenheit = parse_weather_data(raw, "fahrenheit", "mph", now)
+    assert fahrenheit["current"]["temp_symbol"] == "°F"
+    assert fahrenheit["current"]["wind_unit"] == "mph"
+    assert abs(fahrenheit["current"]["temp"] - (celsius["current"]["temp"] * 1.8 + 32)) <= 1
+    assert abs(fahrenheit["current"]["wind_speed"] - celsius["current"]["wind_speed"] / 1.609344) <= 1
+    for c_day, f_day in zip(celsius["daily"], fahrenheit["daily"]):
+        assert abs(f_day["high"] - (c_day["high"] * 1.8 + 32)) <= 1
+
+
+@pytest.mark.parametrize("unit", ["fahrenheit", "celsius"])
+def test_missing_feels_like_is_zero_in_display_units(unit):
+    raw, now = _fixture()
+    raw = copy.deepcopy(raw)
+    raw["hourly"]["apparent_temperature"] = [None] * len(raw["hourly"]["time"])
+    assert parse_weather_data(raw, unit, "mph", now)["current"]["feels_like"] == 0
+    assert parse_weather_batch([raw], unit, "mph", now)[0]["current"]["feels_like"] == 0
+
+
+@pytest.mark.parametrize("name", ["clear", "stormy", "missing"])
+def test_batch_parse_matches_single_parse(name):
+    raw, now = _fixture(name)
+    assert parse_weather_batch([raw, raw], now=now) == [parse_weather_data(raw, now=now)] * 2
@@ -1,6 +1,12 @@
-import requests
+import bisect
+import time
+from collections import namedtuple
 from datetime import datetime, timedelta
 
+import http_client
+
+_numpy_module = None
+
 
 WEATHER_CODE_MAP = {
     0: ("Clear", "clear"),
@@ -34,74 +40,363 @@ WEATHER_CODE_MAP = {
 }
 
 
-def fetch_weather(latitude, longitude, temperature_unit="fahrenheit", wind_speed_unit="mph"):
-    """Fetch weather data from Open-Meteo API."""
-    url = (
-        f"https://api.open-meteo.com/v1/forecast"
-        f"?latitude={latitude}&longitude={longitude}"
+# Display units. Forecasts are fetched in Open-Meteo's metric defaults and
+# converted while parsing; wind units map to (label, km/h per unit).
+TEMPERATURE_SYMBOLS = {"fahrenheit": "°F", "celsius": "°C"}
+WIND_SPEED_UNITS = {
+    "mph": ("mph", 1.609344),
+    "kmh": ("km/h", 1.0),
+    "ms": ("m/s", 3.6),
+    "kn": ("kn", 1.852),
+}
+# Open-Meteo's hourly_units labels for wind speed, in km/h per unit
+_SOURCE_WIND_UNITS = {"km/h": 1.0, "mp/h": 1.609344, "mph": 1.609344, "m/s": 3.6, "kn": 1.852}
+
+# Display unit labels plus the scale (and temperature offset) from a response's units
+_Units = namedtuple("_Units", "temp_symbol temp_scale temp_offset wind_label wind_scale")
+
+_ONE_HOUR = timedelta(hours=1)
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Open-Meteo accepts comma-separated coordinate lists; keep each request's URL
+# comfortably short by splitting large fleets into chunks of this many locations.
+BATCH_CHUNK_SIZE = 50
+
+
+def _forecast_url(latitudes, longitudes, base_url=OPEN_METEO_URL):
+    """Build the Open-Meteo forecast URL for one or more coordinates.
+
+    Always requests Open-Meteo's default metric units (°C, km/h); display
+    units are applied when parsing, so every unit setting shares one fetch.
+    """
+    return (
+        f"{base_url}"
+        f"?latitude={latitudes}&longitude={longitudes}"
         f"&hourly=temperature_2m,apparent_temperature,precipitation_probability,relative_humidity_2m,"
         f"wind_speed_10m,wind_direction_10m,weather_code"
         f"&daily=weather_code,temperature_2m_max,temperature_2m_min"
-        f"&temperature_unit={temperature_unit}"
-        f"&wind_speed_unit={wind_speed_unit}"
         f"&timezone=auto&forecast_days=8"
     )
-    response = requests.get(url, timeout=30)
+
+
+def _cache_key(latitude, longitude):
+    return (float(latitude), float(longitude))
+
+
+def snap_to_grid(latitude, longitude, resolution=0.0):
+    """Round coordinates to the nearest point of a ``resolution``-degree grid.
+
+    Open-Meteo answers from the model grid cell containing a point, so devices
+    a few hundred meters apart get the same forecast; snapping first lets them
+    share one cache entry and one request. A resolution of 0 leaves the
+    coordinates unchanged.
+    """
+    if resolution <= 0:
+        return float(latitude), float(longitude)
+    # round(..., 6) drops float noise like 42.770000000000003 from the key and URL
+    return (
+        round(round(latitude / resolution) * resolution, 6),
+        round(round(longitude / resolution) * resolution, 6),
+    )
+
+
+def fetch_weather(latitude, longitude, cache=None, base_url=OPEN_METEO_URL, grid_resolution=0.0,
+                  with_fetched_at=False):
+    """Fetch weather data from Open-Meteo API (or a compatible ``base_url``).
+
+    If a ``cache.DiskCache`` is given, a still-fresh stored response is
+    returned without a network call and new responses are stored in it.
+    With ``grid_resolution`` (degrees), coordinates are snapped to that grid
+    before the cache lookup and the request. With ``with_fetched_at``, returns
+    (data, epoch seconds when it was fetched from the API) instead.
+    """
+    latitude, longitude = snap_to_grid(latitude, longitude, grid_resolution)
+    key = _cache_key(latitude, longitude)
+    if cache is not None:
+        cached, stored_at = cache.get_entry(key)
+        if cached is not None:
+            return (cached, stored_at) if with_fetched_at else cached
+
+    url = _forecast_url(latitude, longitude, base_url)
+    response = http_client.backend().get(url, timeout=30)
     response.raise_for_status()
-    return response.json()
+    data = response.json()
+    fetched_at = time.time()
+    if cache is not None:
+        cache.set(key, data)
+    return (data, fetched_at) if with_fetched_at else data
+
+
+def fetch_weather_batch(locations, chunk_size=BATCH_CHUNK_SIZE, cache=None, base_url=OPEN_METEO_URL,
+                        grid_resolution=0.0, on_error=None):
+    """Fetch weather data for many (latitude, longitude) pairs.
+
+    Locations are sent to Open-Meteo's multi-location endpoint in chunks of
+    ``chunk_size``; with a ``cache``, only locations without a fresh entry are
+    fetched. Locations that share a point (after snapping to
+    ``grid_resolution`` degrees, if given) are looked up and fetched once and
+    share the same response dict. Returns one raw response dict per location,
+    in input order.
+
+    A failed chunk raises, unless ``on_error`` is given: then it is called with
+    the exception, the other chunks are still fetched, and the failed chunk's
+    locations come back as None.
+    """
+    points = [snap_to_grid(lat, lon, grid_resolution) for lat, lon in locations]
+    unique = list(dict.fromkeys(points))
+    fetched = {}
+    missing = []
+    for point in unique:
+        if cache is not None:
+            cached = cache.get(_cache_key(*point))
+            if cached is not None:
+                fetched[point] = cached
+                continue
+        missing.append(point)
+
+    with http_client.backend().Session() as session:
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            url = _forecast_url(
+                ",".join(str(lat) for lat, _ in chunk),
+                ",".join(str(lon) for _, lon in chunk),
+                base_url,
+            )
+            try:
+                response = session.get(url, timeout=30)
+                response.raise_for_status()
+                payload = response.json()
+                # A single coordinate comes back as a bare object rather than a list
+                if isinstance(payload, dict):
+                    payload = [payload]
+                if len(payload) != len(chunk):
+                    raise ValueError(
+                        f"Open-Meteo returned {len(payload)} forecasts for {len(chunk)} locations"
+                    )
+            except Exception as exc:
+                if on_error is None:
+                    raise
+                on_error(exc)
+                continue
+            for point, data in zip(chunk, payload):
+                fetched[point] = data
+                if cache is not None:
+                    cache.set(_cache_key(*point), data)
+    return [fetched.get(point) for point in points]
+
+
+def _hour_indices(times, targets):
+    """Return the index of each "YYYY-MM-DDTHH:00" target in times, or None if absent.
 
+    Open-Meteo hours are evenly spaced, so an index is normally just the offset
+    from the first timestamp; a lookup dict, built on the first mismatch, covers
+    gaps such as DST transitions.
+    """
+    if not times:
+        return [None] * len(targets)
+    start = datetime.fromisoformat(times[0])
+    n = len(times)
+    lookup = None
+    indices = []
+    for t in targets:
+        idx = (datetime.fromisoformat(t) - start) // _ONE_HOUR
+        if not (0 <= idx < n and times[idx] == t):
+            if lookup is None:
+                lookup = {v: i for i, v in enumerate(times)}
+            idx = lookup.get(t)
+        indices.append(idx)
+    return indices
 
-def _find_current_hour_index(times):
+
+def _find_current_hour_index(times, now):
     """Find the index of the current hour in the hourly time list."""
-    now = datetime.now()
     current_hour_str = now.strftime("%Y-%m-%dT%H:00")
-    try:
-        return times.index(current_hour_str)
-    except ValueError:
-        # Fallback: find closest hour
-        for i, t in enumerate(times):
-            if t >= current_hour_str:
-                return max(0, i - 1)
-        return 0
+    idx = _hour_indices(times, [current_hour_str])[0]
+    if idx is not None:
+        return idx
+    # Fallback: the hour before the first later one (times are sorted)
+    i = bisect.bisect_left(times, current_hour_str)
+    return max(0, i - 1) if i < len(times) else 0
 
 
-def _find_today_index(dates):
+def _find_today_index(dates, now):
     """Find the index of today in the daily date list."""
-    today_str = datetime.now().strftime("%Y-%m-%d")
+    today_str = now.strftime("%Y-%m-%d")
     try:
         return dates.index(today_str)
     except ValueError:
         return 0
 
 
+_COMPASS_DIRECTIONS = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
+# Arrow characters pointing in the direction the wind is blowing FROM
+# (meteorological convention: wind direction = where it comes from)
+_COMPASS_ARROWS = ["↑", "↗", "→", "↘", "↓", "↙", "←", "↖"]
+
+
 def _wind_direction_label(degrees):
     """Convert wind direction degrees to compass arrow character and label."""
-    directions = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
-    # Arrow characters pointing in the direction the wind is blowing FROM
-    # (meteorological convention: wind direction = where it comes from)
-    arrows = ["↑", "↗", "→", "↘", "↓", "↙", "←", "↖"]
     idx = round(degrees / 45) % 8
-    return arrows[idx], directions[idx]
+    return _COMPASS_ARROWS[idx], _COMPASS_DIRECTIONS[idx]
 
 
-def parse_weather_data(data, temperature_unit="fahrenheit", wind_speed_unit="mph"):
-    """Parse Open-Meteo response into structured weather data."""
+def _chart_targets(now):
+    """Chart hours: 19 hourly timestamps from 6am today through midnight (00:00 tomorrow)."""
+    today_str = now.strftime("%Y-%m-%d")
+    tomorrow_str = (now + timedelta(days=1)).strftime("%Y-%m-%d")
+    target_times = [f"{today_str}T{h:02d}:00" for h in range(6, 24)]
+    target_times.append(f"{tomorrow_str}T00:00")
+    return target_times
+
+
+def _display_units(data, temperature_unit, wind_speed_unit):
+    """Conversions from a response's units (from its hourly_units) to the display units."""
+    if temperature_unit not in TEMPERATURE_SYMBOLS:
+        raise ValueError(f"Unsupported temperature unit: {temperature_unit}")
+    if wind_speed_unit not in WIND_SPEED_UNITS:
+        raise ValueError(f"Unsupported wind speed unit: {wind_speed_unit}")
+    source = data.get("hourly_units") or {}
+
+    temp_scale, temp_offset = 1.0, 0.0
+    source_fahrenheit = "F" in source.get("temperature_2m", "°C")
+    if temperature_unit == "fahrenheit" and not source_fahrenheit:
+        temp_scale, temp_offset = 1.8, 32.0
+    elif temperature_unit == "celsius" and source_fahrenheit:
+        temp_scale, temp_offset = 1 / 1.8, -32 / 1.8
+
+    wind_label, wind_kmh = WIND_SPEED_UNITS[wind_speed_unit]
+    source_kmh = _SOURCE_WIND_UNITS.get(source.get("wind_speed_10m", "km/h"), 1.0)
+    wind_scale = 1.0 if source_kmh == wind_kmh else source_kmh / wind_kmh
+    return _Units(TEMPERATURE_SYMBOLS[temperature_unit], temp_scale, temp_offset, wind_label, wind_scale)
+
+
+def _chart_hours(hourly, target_times, indices, wind_scale=1.0):
+    """Build chart hour dicts, skipping targets missing from the forecast."""
+    chart_hours = []
+    for t, idx in zip(target_times, indices):
+        if idx is None:
+            continue
+        wind_deg = hourly["wind_direction_10m"][idx] or 0
+        arrow, direction = _wind_direction_label(wind_deg)
+        chart_hours.append({
+            "time": t,
+            "precipitation": hourly["precipitation_probability"][idx] or 0,
+            "wind_speed": round((hourly["wind_speed_10m"][idx] or 0) * wind_scale),
+            "wind_direction": direction,
+            "wind_arrow": arrow,
+        })
+    return chart_hours
+
+
+def parse_weather_data(data, temperature_unit="fahrenheit", wind_speed_unit="mph", now=None):
+    """Parse Open-Meteo response into structured weather data.
+
+    ``now`` selects the current hour, today and the chart window; it defaults
+    to the current time, so a cached response can be re-parsed as the clock
+    advances without fetching it again.
+    """
+    if now is None:
+        now = datetime.now()
+    hourly = data["hourly"]
+    units = _display_units(data, temperature_unit, wind_speed_unit)
+    target_times = _chart_targets(now)
+    chart_hours = _chart_hours(hourly, target_times, _hour_indices(hourly["time"], target_times), units.wind_scale)
+    return _assemble(data, chart_hours, units, now)
+
+
+def _numpy():
+    """NumPy, imported on first use since it is slow to import; None if not installed."""
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+        except ImportError:  # optional: parse_weather_batch falls back to per-forecast parsing
+            numpy = False
+        _numpy_module = numpy
+    return _numpy_module or None
+
+
+def parse_weather_batch(datas, temperature_unit="fahrenheit", wind_speed_unit="mph", now=None):
+    """Parse many Open-Meteo responses; returns one parse_weather_data result each.
+
+    With NumPy installed, the chart series (precipitation, wind speed and
+    direction, compass buckets) of every forecast are gathered as array slices
+    and converted in one vectorized pass. Forecasts whose chart window has gaps,
+    and every forecast when NumPy is missing, take the per-forecast path.
+    """
+    if now is None:
+        now = datetime.now()
+    np = _numpy()
+    if np is None:
+        return [parse_weather_data(d, temperature_unit, wind_speed_unit, now) for d in datas]
+
+    target_times = _chart_targets(now)
+    n = len(target_times)
+    results = [None] * len(datas)
+    rows, starts, units = [], [], []
+    for i, data in enumerate(datas):
+        units.append(_display_units(data, temperature_unit, wind_speed_unit))
+        indices = _hour_indices(data["hourly"]["time"], target_times)
+        if None not in indices and indices[-1] - indices[0] == n - 1:
+            rows.append(i)
+            starts.append(indices[0])
+        else:
+            hourly = data["hourly"]
+            chart_hours = _chart_hours(hourly, target_times, indices, units[i].wind_scale)
+            results[i] = _assemble(data, chart_hours, units[i], now)
+
+    if rows:
+        def series(name):
+            # None (missing) becomes NaN, then 0 like the per-forecast "or 0"
+            arr = np.array(
+                [datas[i]["hourly"][name][s:s + n] for i, s in zip(rows, starts)], dtype=float,
+            )
+            return np.nan_to_num(arr, nan=0.0)
+
+        precip = np.rint(series("precipitation_probability")).astype(int).tolist()
+        wind_scales = np.array([units[i].wind_scale for i in rows])[:, None]
+        wind = np.rint(series("wind_speed_10m") * wind_scales).astype(int).tolist()
+        # np.rint rounds half to even, matching round() in _wind_direction_label
+        buckets = (np.rint(series("wind_direction_10m") / 45).astype(int) % 8).tolist()
+        for r, i in enumerate(rows):
+            chart_hours = [
+                {
+                    "time": t,
+                    "precipitation": p,
+                    "wind_speed": w,
+                    "wind_direction": _COMPASS_DIRECTIONS[b],
+                    "wind_arrow": _COMPASS_ARROWS[b],
+                }
+                for t, p, w, b in zip(target_times, precip[r], wind[r], buckets[r])
+            ]
+            results[i] = _assemble(datas[i], chart_hours, units[i], now)
+    return results
+
+
+def _assemble(data, chart_hours, units, now):
+    """Build the parsed result around already-extracted chart hours."""
     hourly = data["hourly"]
     daily = data["daily"]
 
-    temp_symbol = "°F" if temperature_unit == "fahrenheit" else "°C"
-    wind_unit = wind_speed_unit
+    temp_symbol = units.temp_symbol
+    wind_unit = units.wind_label
+
+    def temp(value):
+        return round(value * units.temp_scale + units.temp_offset)
 
     # Current conditions (nearest hour)
-    current_idx = _find_current_hour_index(hourly["time"])
+    current_idx = _find_current_hour_index(hourly["time"], now)
+    # A missing value falls back to 0 in display units, not 0 converted from °C
+    feels_like = hourly["apparent_temperature"][current_idx]
 
     current = {
-        "temp": round(hourly["temperature_2m"][current_idx]),
-        "feels_like": round(hourly["apparent_temperature"][current_idx] or 0),
+        "temp": temp(hourly["temperature_2m"][current_idx]),
+        "feels_like": temp(feels_like) if feels_like is not None else 0,
         "temp_symbol": temp_symbol,
         "precipitation": hourly["precipitation_probability"][current_idx] or 0,
         "humidity": hourly["relative_humidity_2m"][current_idx] or 0,
-        "wind_speed": round(hourly["wind_speed_10m"][current_idx] or 0),
+        "wind_speed": round((hourly["wind_speed_10m"][current_idx] or 0) * units.wind_scale),
         "wind_unit": wind_unit,
         "weather_code": hourly["weather_code"][current_idx] or 0,
     }
@@ -110,30 +405,6 @@ def parse_weather_data(data, temperature_unit="fahrenheit", wind_speed_unit="mph
     current["description"] = code_info[0]
     current["icon"] = code_info[1]
 
-    # Chart hours: 19 hourly data points from 6am today through midnight (00:00 tomorrow)
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    tomorrow_str = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-
-    target_times = [f"{today_str}T{h:02d}:00" for h in range(6, 24)]
-    target_times.append(f"{tomorrow_str}T00:00")
-
-    chart_hours = []
-    all_times = hourly["time"]
-    for t in target_times:
-        try:
-            idx = all_times.index(t)
-            wind_deg = hourly["wind_direction_10m"][idx] or 0
-            arrow, direction = _wind_direction_label(wind_deg)
-            chart_hours.append({
-                "time": t,
-                "precipitation": hourly["precipitation_probability"][idx] or 0,
-                "wind_speed": round(hourly["wind_speed_10m"][idx] or 0),
-                "wind_direction": direction,
-                "wind_arrow": arrow,
-            })
-        except ValueError:
-            continue
-
     # Hourly labels: 7 display slots at fixed positions (6am, 9am, 12pm, 3pm, 6pm, 9pm, 12am)
     LABEL_INDICES = [0, 3, 6, 9, 12, 15, 18]
     label_times = ["6am", "9am", "12pm", "3pm", "6pm", "9pm", "12am"]
@@ -145,7 +416,7 @@ def parse_weather_data(data, temperature_unit="fahrenheit", wind_speed_unit="mph
             hourly_forecast.append(slot)
 
     # Daily forecast: 7 days starting from today
-    today_idx = _find_today_index(daily["time"])
+    today_idx = _find_today_index(daily["time"], now)
     daily_forecast = []
     for i in range(7):
         idx = today_idx + i
@@ -163,8 +434,8 @@ def parse_weather_data(data, temperature_unit="fahrenheit", wind_speed_unit="mph
 
         daily_forecast.append({
             "day": day_label,
-            "high": round(daily["temperature_2m_max"][idx]),
-            "low": round(daily["temperature_2m_min"][idx]),
+            "high": temp(daily["temperature_2m_max"][idx]),
+            "low": temp(daily["temperature_2m_min"][idx]),
             "icon": code_info[1],
             "description": code_info[0],
             "temp_symbol": temp_symbol,